@@ -0,0 +1,675 @@
+"""Murojaat boti uchun benchmarklar
+
+Ishga tushirish:
+    python benchmark.py db --calls 2000
+    python benchmark.py export --rows 100000
+    python benchmark.py sends --private 60 --groups 3
+    python benchmark.py writes --clients 300
+    python benchmark.py flow --users 500 --output flow.json
+    python benchmark.py search --rows 1000000
+
+Benchmark vaqtinchalik database faylida ishlaydi, Telegramga ulanmaydi.
+So'rov rejalari (indekslar) tests/test_query_plans.py da tekshiriladi.
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import re
+import sys
+import tempfile
+import time
+
+# Bot modulini import qilishdan oldin vaqtinchalik database yo'lini o'rnatamiz
+_TMP_DIR = tempfile.mkdtemp(prefix="murojaat_bench_")
+os.environ.setdefault("DB_PATH", os.path.join(_TMP_DIR, "bench.db"))
+os.environ.setdefault("MEDIA_PATH", os.path.join(_TMP_DIR, "media"))
+
+import aiosqlite  # noqa: E402
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.dispatcher.event.bases import UNHANDLED  # noqa: E402
+from aiogram.exceptions import TelegramRetryAfter  # noqa: E402
+from aiogram.types import Chat, File, Message, PhotoSize, Update, User  # noqa: E402
+from datetime import datetime  # noqa: E402
+
+import bot_railway_full as app  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+def percentile(samples, pct):
+    """Tartiblangan namunadan foiz qiymatini olish"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, samples):
+    """Natijalarni mikrosekundlarda chiqarish"""
+    us = [s * 1e6 for s in samples]
+    print(
+        f"{name:<40} n={len(us):<6} "
+        f"mean={statistics.fmean(us):8.1f}us  "
+        f"p50={percentile(us, 50):8.1f}us  "
+        f"p99={percentile(us, 99):8.1f}us"
+    )
+
+
+async def seed(database, users: int, per_user: int):
+    """Benchmark uchun namunaviy ma'lumotlar"""
+    categories = list(app.CATEGORY_GROUPS)
+    for user_id in range(1, users + 1):
+        for n in range(per_user):
+            murojaat_id = await database.add_murojaat(
+                user_id=user_id,
+                full_name="Aliyev Vali",
+                passport="AA1234567",
+                phone="+998901234567",
+                address="Qarshi shahri",
+                category=categories[(user_id + n) % len(categories)],
+                text="Benchmark murojaat matni",
+                group_message_id=user_id * 1000 + n,
+            )
+            if n % 2 == 0:
+                await database.add_javob(murojaat_id, 1, "admin", "Javob matni")
+
+
+async def time_calls(func, calls: int):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        await func(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_db(args):
+    """Har bir chaqiruv uchun ulanish ochish va hovuzdan foydalanishni solishtirish"""
+    database = app.db
+    await database.init_db()
+    await seed(database, args.users, args.per_user)
+
+    async def per_call_connect(i):
+        # Oldingi usul: har bir chaqiruvda yangi ulanish
+        user_id = i % args.users + 1
+        async with aiosqlite.connect(database.db_path) as conn:
+            conn.row_factory = aiosqlite.Row
+            async with conn.execute(
+                "SELECT * FROM javoblar WHERE murojaat_id = ? ORDER BY created_at DESC",
+                (user_id,)
+            ) as cursor:
+                [dict(row) for row in await cursor.fetchall()]
+
+    async def pooled(i):
+        await database.get_murojaat_javoblar(i % args.users + 1)
+
+    async def per_call_write(i):
+        async with aiosqlite.connect(database.db_path) as conn:
+            await conn.execute(
+                "UPDATE murojaatlar SET status = ?, admin_checked_at = CURRENT_TIMESTAMP WHERE id = ?",
+                ("Yangi", i % args.users + 1)
+            )
+            await conn.commit()
+
+    async def pooled_write(i):
+        await database.update_status(i % args.users + 1, "Yangi")
+
+    print(f"DB: {database.db_path}")
+    summarize("read  / connect per call (oldin)", await time_calls(per_call_connect, args.calls))
+    summarize("read  / pool (hozir)", await time_calls(pooled, args.calls))
+    summarize("write / connect per call (oldin)", await time_calls(per_call_write, args.calls // 4))
+    summarize("write / long-lived writer (hozir)", await time_calls(pooled_write, args.calls // 4))
+    await database.close()
+
+
+async def bulk_seed(database, rows: int):
+    """Ko'p qatorli export benchmarki uchun tez to'ldirish"""
+    categories = list(app.CATEGORY_GROUPS)
+    async with database.writer() as conn:
+        await conn.executemany(
+            """INSERT INTO murojaatlar
+               (user_id, full_name, passport, phone, address, category, text, group_message_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                (i % 5000, "Aliyev Vali", "AA1234567", "+998901234567", "Qarshi shahri",
+                 categories[i % len(categories)], "Benchmark murojaat matni", i)
+                for i in range(rows)
+            )
+        )
+        await conn.executemany(
+            "INSERT INTO javoblar (murojaat_id, admin_id, admin_username, javob_text) VALUES (?, 1, 'admin', 'Javob')",
+            ((i,) for i in range(1, rows + 1, 3))
+        )
+
+
+def peak_rss_mb() -> float:
+    """Jarayonning eng yuqori RSS qiymati (MB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def bench_export(args):
+    """Excel export vaqti va xotirasi"""
+    database = app.db
+    await database.init_db()
+    await bulk_seed(database, args.rows)
+    os.makedirs(app.MEDIA_PATH, exist_ok=True)
+    args.filters = {}
+    if args.category:
+        args.filters['categories'] = [args.category]
+    if args.days:
+        args.filters['date_from'] = app.day_start_utc(days_ago=args.days)
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    path = await app.create_report(
+        os.path.join(app.MEDIA_PATH, f"bench.{args.format}"), fmt=args.format, filters=args.filters
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"format={args.format} filters={args.filters or '-'}")
+    print(f"rows={args.rows} time={elapsed:.2f}s size={os.path.getsize(path) / 1e6:.1f}MB "
+          f"peak_rss={peak_rss_mb():.0f}MB (seed dan keyin {rss_before:.0f}MB)")
+    await database.close()
+
+
+class FakeSession(BaseSession):
+    """Tarmoqsiz bot sessiyasi: so'rovlarni yozib oladi va soxta javob qaytaradi"""
+
+    def __init__(self, latency: float = 0.0, flood_rate: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.calls = []
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = getattr(method, "chat_id", None)
+        self.calls.append((time.monotonic(), chat_id, type(method).__name__))
+        if self.flood_rate and random.random() < self.flood_rate:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=1)
+
+        returning = method.__returning__
+        if returning is Message:
+            chat_type = "private" if isinstance(chat_id, int) and chat_id > 0 else "supergroup"
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id or 0, type=chat_type),
+                text=getattr(method, "text", None),
+                photo=self._photo(getattr(method, "photo", None)),
+            )
+        if returning is User:
+            return User(id=bot.id, is_bot=True, first_name="bot")
+        if returning is File:
+            file_id = getattr(method, "file_id", "file")
+            return File(file_id=file_id, file_unique_id=file_id, file_path=f"photos/{file_id}.jpg")
+        return True
+
+    def _photo(self, photo):
+        """send_photo javobi: file_id bo'yicha qayta yuborishda o'sha id"""
+        if photo is None:
+            return None
+        file_id = photo if isinstance(photo, str) else f"uploaded-{next(self._message_ids)}"
+        return [PhotoSize(file_id=file_id, file_unique_id=file_id, width=1, height=1)]
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def max_in_window(times, window: float) -> int:
+    """Istalgan [t, t + window) oralig'idagi eng ko'p so'rovlar soni"""
+    times = sorted(times)
+    best = 0
+    start = 0
+    for end, t in enumerate(times):
+        while t - times[start] >= window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def bench_sends(args):
+    """SendScheduler o'tkazuvchanligi va kechikishi, oynalardagi eng ko'p so'rovlar"""
+    session = FakeSession(latency=args.latency, flood_rate=args.flood_rate)
+    fake_bot = Bot(token=app.BOT_TOKEN, session=session)
+    scheduler = app.SendScheduler(
+        global_rate=args.global_rate,
+        private_rate=args.private_rate,
+        group_per_minute=args.group_per_minute,
+    )
+    session.middleware(scheduler)
+
+    latencies = {"interactive": [], "bulk": []}
+
+    async def send(chat_id, kind):
+        start = time.perf_counter()
+        if kind == "bulk":
+            async with app.bulk_sends():
+                await fake_bot.send_message(chat_id, "eslatma")
+        else:
+            await fake_bot.send_message(chat_id, "javob")
+        latencies[kind].append(time.perf_counter() - start)
+
+    jobs = []
+    for n in range(args.groups):
+        jobs += [send(-1000 - n, "bulk") for _ in range(args.per_group)]
+    for n in range(args.private):
+        jobs += [send(n + 1, "interactive") for _ in range(args.per_private)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - start
+    await scheduler.close()
+
+    all_times = [t for t, _, _ in session.calls]
+    by_chat = {}
+    for t, chat_id, _ in session.calls:
+        by_chat.setdefault(chat_id, []).append(t)
+
+    global_max = max_in_window(all_times, 1.0)
+    private_max = max((max_in_window(ts, 1.0) for c, ts in by_chat.items() if c > 0), default=0)
+    group_max = max((max_in_window(ts, 60.0) for c, ts in by_chat.items() if c < 0), default=0)
+
+    print(f"requests={len(session.calls)} sent={scheduler.sent} retried={scheduler.retried} "
+          f"time={elapsed:.2f}s throughput={scheduler.sent / elapsed:.1f}/s")
+    for kind, samples in latencies.items():
+        if samples:
+            summarize(f"latency {kind}", samples)
+
+    # Limit tekshiruvlari: tests/test_send_scheduler.py
+    observed = [
+        ("global / 1s", global_max, args.global_rate),
+        ("private chat / 1s", private_max, args.private_rate + scheduler.private_burst),
+        ("group chat / 60s", group_max, args.group_per_minute),
+    ]
+    for name, value, limit in observed:
+        print(f"{name:<20} max={value} limit={limit:g}")
+
+
+async def run_write_burst(group_commit: bool, args):
+    """Bir vaqtda kelgan murojaat va javoblar yozuvi"""
+    database = app.Database()
+    database.db_path = os.path.join(_TMP_DIR, f"writes_{'group' if group_commit else 'single'}.db")
+    database.group_commit = group_commit
+    database.batch_size = args.batch_size
+    database.batch_wait = args.wait_ms / 1000
+    await database.init_db()
+    commits_before = database.commits
+    categories = list(app.CATEGORY_GROUPS)
+    latencies = []
+
+    async def client(n):
+        for k in range(args.per_client):
+            start = time.perf_counter()
+            murojaat_id = await database.add_murojaat(
+                user_id=n, full_name="Aliyev Vali", passport="AA1234567", phone="+998901234567",
+                address="Qarshi shahri", category=categories[n % len(categories)],
+                text="Benchmark murojaat matni", group_message_id=n * 1000 + k,
+            )
+            latencies.append(time.perf_counter() - start)
+            if k % 2 == 0:
+                start = time.perf_counter()
+                await database.add_javob_with_status(murojaat_id, 1, "admin", "Javob matni")
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(1, args.clients + 1)))
+    elapsed = time.perf_counter() - start
+    commits = database.commits - commits_before
+    await database.close()
+
+    ms = [t * 1000 for t in latencies]
+    print(
+        f"{'group commit' if group_commit else 'har biri alohida':<17} writes={len(ms):<6} "
+        f"commits={commits:<6} time={elapsed:6.2f}s "
+        f"writes/s={len(ms) / elapsed:8.1f} commits/s={commits / elapsed:8.1f} "
+        f"p50={percentile(ms, 50):7.2f}ms p95={percentile(ms, 95):7.2f}ms p99={percentile(ms, 99):7.2f}ms"
+    )
+
+
+async def bench_writes(args):
+    """Group commit yoqilgan va o'chirilgan holda yozish o'tkazuvchanligi"""
+    print(f"clients={args.clients} per_client={args.per_client} "
+          f"batch={args.batch_size} wait={args.wait_ms:g}ms")
+    await run_write_burst(False, args)
+    await run_write_burst(True, args)
+
+
+class FlowSession(FakeSession):
+    """Guruhga yuborilgan murojaat xabarlarini simulyatsiya foydalanuvchisiga bog'laydi"""
+
+    MARKER = re.compile(r"Benchmark #(\d+)")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.group_posts = {}
+
+    async def make_request(self, bot, method, timeout=None):
+        result = await super().make_request(bot, method, timeout)
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(chat_id, int) and chat_id < 0 and isinstance(result, Message):
+            match = self.MARKER.search(getattr(method, "caption", None) or getattr(method, "text", None) or "")
+            if match:
+                self.group_posts.setdefault(int(match.group(1)), []).append((chat_id, result.message_id))
+        return result
+
+
+class DbTimer:
+    """Database ning ochiq async metodlarida o'tgan vaqtni yig'ish (ichma-ich chaqiruvlar bir marta)"""
+
+    def __init__(self, database):
+        self.total = 0.0
+        self.calls = 0
+        self._active = contextvars.ContextVar("db_timer_active", default=False)
+        for name, method in inspect.getmembers(database, inspect.iscoroutinefunction):
+            if not name.startswith("_"):
+                setattr(database, name, self._wrap(method))
+
+    def _wrap(self, method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            if self._active.get():
+                return await method(*args, **kwargs)
+            token = self._active.set(True)
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - start
+                self.calls += 1
+                self._active.reset(token)
+        return timed
+
+
+async def bench_flow(args):
+    """Haqiqiy dp orqali to'liq murojaat FSM oqimi va guruh javoblari"""
+    session = FlowSession(latency=args.latency)
+    bot = app.bot
+    bot.session = session
+    if args.rate_limits:
+        session.middleware(app.send_scheduler)
+    app.DAILY_LIMIT = app.quota.limit = args.rounds
+    app.db.group_commit = args.group_commit
+
+    await app.db.init_db()
+    await app.quota.warm(app.db)
+    if isinstance(app.fsm_storage, app.SQLiteStorage):
+        await app.fsm_storage.start(app.db)
+    db_timer = DbTimer(app.db)
+
+    categories = list(app.CATEGORY_GROUPS)
+    group_ids = sorted(app.get_all_group_ids())
+    update_ids = itertools.count(1)
+    message_ids = itertools.count(1)
+    latencies = {}
+    unhandled = 0
+
+    def message_update(chat_id, chat_type, user, text, reply_to=None):
+        message = {
+            "message_id": next(message_ids), "date": int(time.time()),
+            "chat": {"id": chat_id, "type": chat_type}, "from": user, "text": text,
+        }
+        if reply_to is not None:
+            message["reply_to_message"] = {
+                "message_id": reply_to, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": chat_type},
+            }
+        return {"update_id": next(update_ids), "message": message}
+
+    def callback_update(user, data):
+        return {"update_id": next(update_ids), "callback_query": {
+            "id": str(next(update_ids)), "from": user, "chat_instance": "bench", "data": data,
+            "message": {"message_id": next(message_ids), "date": int(time.time()),
+                        "chat": {"id": user["id"], "type": "private"},
+                        "from": {"id": bot.id, "is_bot": True, "first_name": "bot"},
+                        "text": "📸 Rasm yuklashni xohlaysizmi?"},
+        }}
+
+    async def feed(step, raw):
+        nonlocal unhandled
+        update = Update.model_validate(raw, context={"bot": bot})
+        start = time.perf_counter()
+        result = await app.dp.feed_update(bot, update)
+        latencies.setdefault(step, []).append(time.perf_counter() - start)
+        if result is UNHANDLED:
+            unhandled += 1
+        if args.think:
+            await asyncio.sleep(random.uniform(0, args.think))
+
+    async def citizen(uid):
+        user = {"id": uid, "is_bot": False, "first_name": f"Fuqaro{uid}"}
+        admin = {"id": 10_000_000 + uid, "is_bot": False, "first_name": "Admin", "username": "admin"}
+        for round_no in range(args.rounds):
+            steps = [
+                ("start", "📝 Murojaat yuborish"),
+                ("full_name", "Aliyev Vali Valiyevich"),
+                ("passport", "AA1234567"),
+                ("phone", "+998901234567"),
+                ("address", "Qarshi shahri, Istiqlol MFY"),
+                ("category", categories[(uid + round_no) % len(categories)]),
+                ("text", f"Benchmark #{uid} murojaat matni, yo'l ta'mirlash kerak"),
+            ]
+            for step, text in steps:
+                await feed(step, message_update(uid, "private", user, text))
+            await feed("skip_photo", callback_update(user, "skip_photo"))
+
+            posts = session.group_posts.get(uid) or []
+            if posts and random.random() < args.reply_ratio:
+                group_id, group_message_id = posts[-1]
+                await feed("group_reply", message_update(
+                    group_id, "supergroup", admin, "Murojaatingiz ko'rib chiqildi, rahmat", group_message_id
+                ))
+
+    if not group_ids:
+        print("Guruhlar sozlanmagan")
+        return
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    await asyncio.gather(*(citizen(uid) for uid in range(1, args.users + 1)))
+    elapsed = time.perf_counter() - start
+
+    if isinstance(app.fsm_storage, app.SQLiteStorage):
+        await app.fsm_storage.close()
+    stats = await app.db.get_all_statistics()
+    await app.db.close()
+    if args.rate_limits:
+        await app.send_scheduler.close()
+
+    all_samples = [t for samples in latencies.values() for t in samples]
+    handler_time = sum(all_samples)
+    ms = [t * 1000 for t in all_samples]
+    results = {
+        "benchmark": "flow",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "users": args.users, "rounds": args.rounds, "reply_ratio": args.reply_ratio,
+            "latency": args.latency, "think": args.think, "rate_limits": args.rate_limits,
+            "group_commit": args.group_commit, "fsm_storage": app.FSM_STORAGE,
+            "journal_mode": app.DB_JOURNAL_MODE,
+        },
+        "updates": len(all_samples),
+        "unhandled": unhandled,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_sec": round(len(all_samples) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(ms, 50), 3), "p95": round(percentile(ms, 95), 3),
+            "p99": round(percentile(ms, 99), 3), "max": round(max(ms), 3),
+        },
+        "steps_ms": {
+            step: {
+                "n": len(samples),
+                "p50": round(percentile([t * 1000 for t in samples], 50), 3),
+                "p99": round(percentile([t * 1000 for t in samples], 99), 3),
+            }
+            for step, samples in latencies.items()
+        },
+        "db_calls": db_timer.calls,
+        "db_time_share": round(db_timer.total / handler_time, 4) if handler_time else 0.0,
+        "api_calls": len(session.calls),
+        "appeals_saved": stats["total"],
+        "appeals_answered": stats["answered"],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_before_mb": round(rss_before, 1),
+    }
+
+    print(f"users={args.users} rounds={args.rounds} updates={results['updates']} "
+          f"time={elapsed:.2f}s updates/s={results['updates_per_sec']}")
+    print("latency  " + "  ".join(f"{k}={v:.2f}ms" for k, v in results["latency_ms"].items()))
+    for step, row in results["steps_ms"].items():
+        print(f"  {step:<12} n={row['n']:<6} p50={row['p50']:8.2f}ms p99={row['p99']:8.2f}ms")
+    print(f"db_time_share={results['db_time_share']:.1%} db_calls={db_timer.calls} "
+          f"api_calls={results['api_calls']} saved={results['appeals_saved']} "
+          f"answered={results['appeals_answered']} peak_rss={results['peak_rss_mb']}MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"natijalar: {args.output}")
+
+    expected = args.users * args.rounds
+    if stats["total"] != expected or unhandled:
+        print(f"FAIL saqlangan murojaatlar {stats['total']}/{expected}, qayta ishlanmagan update: {unhandled}")
+        sys.exit(1)
+
+
+# Tez-tez uchraydigan so'zlar; qolgan lug'at Zipf taqsimotida sun'iy so'zlar
+SEARCH_WORDS = [
+    "suv", "quvur", "yorildi", "elektr", "chiroq", "gaz", "bosim", "yo'l", "chuqur", "asfalt",
+    "maktab", "o'qituvchi", "shifoxona", "navbat", "dori", "nafaqa", "chiqindi", "axlat",
+    "avtobus", "bekat", "svetofor", "issiqlik", "kanalizatsiya", "daraxt", "ko'prik", "bog'cha",
+]
+SEARCH_STREETS = ["Istiqlol", "Mustaqillik", "Navoiy", "Amir Temur", "Bobur", "Nasaf", "Kesh", "Yangiobod"]
+
+
+async def search_seed(database, rows: int):
+    """FTS benchmarki uchun turli so'zli murojaatlar (indeks triggerlar orqali)"""
+    categories = list(app.CATEGORY_GROUPS)
+    rng = random.Random(23)
+    vocabulary = SEARCH_WORDS + [f"soz{n}" for n in range(20000)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    chunk = 50000
+    for start in range(0, rows, chunk):
+        async with database.writer() as conn:
+            await conn.executemany(
+                """INSERT INTO murojaatlar
+                   (user_id, full_name, passport, phone, address, category, text)
+                   VALUES (?, 'Aliyev Vali', 'AA1234567', '+998901234567', ?, ?, ?)""",
+                (
+                    (i % 5000, f"{rng.choice(SEARCH_STREETS)} ko'chasi {i % 300} uy",
+                     categories[i % len(categories)],
+                     " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=12)) + f" raqam{i}")
+                    for i in range(start, min(rows, start + chunk))
+                )
+            )
+
+
+async def bench_search(args):
+    """FTS5 qidiruv kechikishi: birinchi sahifa (soni bilan) va keyingi sahifalar"""
+    app.logger.setLevel(logging.ERROR)
+    database = app.db
+    await database.init_db()
+    if not database.fts_enabled:
+        print("FAIL SQLite FTS5 mavjud emas")
+        sys.exit(1)
+    start = time.perf_counter()
+    await search_seed(database, args.rows)
+    print(f"seed rows={args.rows} time={time.perf_counter() - start:.1f}s")
+    async with database.writer() as conn:
+        await conn.execute("INSERT INTO murojaatlar_fts (murojaatlar_fts) VALUES ('optimize')")
+
+    queries = ["suv", "suv quvur", "istiqlol", "elektr chiroq navoiy", "ko'prik", "soz1234", "raqam12345"]
+    group_categories = [list(app.CATEGORY_GROUPS)[0]]
+    for label, categories in (("barcha", []), ("guruh", group_categories)):
+        for query in queries:
+            match = app.build_search_match(query)
+            total = await database.count_search(match, categories)
+            ranked = total <= app.SEARCH_COUNT_LIMIT
+
+            async def first_page(i):
+                await database.count_search(match, categories)
+                await database.search_murojaatlar(match, categories, ranked=ranked)
+
+            async def next_page(i):
+                await database.search_murojaatlar(
+                    match, categories, offset=app.SEARCH_PAGE_SIZE * (1 + i % 5), ranked=ranked)
+
+            name = f"{label} '{query}' ({total}, {'bm25' if ranked else 'rowid'})"
+            summarize(f"{name} 1-sahifa", await time_calls(first_page, args.calls))
+            summarize(f"{name} keyingi", await time_calls(next_page, args.calls))
+    await database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    db_parser = sub.add_parser("db", help="Database chaqiruvlari kechikishi")
+    db_parser.add_argument("--calls", type=int, default=2000)
+    db_parser.add_argument("--users", type=int, default=200)
+    db_parser.add_argument("--per-user", type=int, default=5)
+    db_parser.set_defaults(func=bench_db)
+
+    export_parser = sub.add_parser("export", help="Excel export vaqti va xotirasi")
+    export_parser.add_argument("--rows", type=int, default=100000)
+    export_parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    export_parser.add_argument("--category", help="Faqat shu kategoriya (filtrlangan export)")
+    export_parser.add_argument("--days", type=int, help="Faqat oxirgi N kun")
+    export_parser.set_defaults(func=bench_export)
+
+    sends_parser = sub.add_parser("sends", help="Yuborish navbati: o'tkazuvchanlik va limitlar")
+    sends_parser.add_argument("--private", type=int, default=60, help="shaxsiy chatlar soni")
+    sends_parser.add_argument("--per-private", type=int, default=2)
+    sends_parser.add_argument("--groups", type=int, default=3)
+    sends_parser.add_argument("--per-group", type=int, default=5)
+    sends_parser.add_argument("--latency", type=float, default=0.005, help="soxta API kechikishi (s)")
+    sends_parser.add_argument("--flood-rate", type=float, default=0.0, help="429 qaytarish ehtimoli")
+    sends_parser.add_argument("--global-rate", type=float, default=app.SEND_GLOBAL_RATE)
+    sends_parser.add_argument("--private-rate", type=float, default=app.SEND_PRIVATE_RATE)
+    sends_parser.add_argument("--group-per-minute", type=float, default=app.SEND_GROUP_PER_MINUTE)
+    sends_parser.set_defaults(func=bench_sends)
+
+    writes_parser = sub.add_parser("writes", help="Group commit: commits/s va kechikish")
+    writes_parser.add_argument("--clients", type=int, default=300, help="bir vaqtda yozayotganlar")
+    writes_parser.add_argument("--per-client", type=int, default=4)
+    writes_parser.add_argument("--batch-size", type=int, default=app.DB_GROUP_COMMIT_BATCH)
+    writes_parser.add_argument("--wait-ms", type=float, default=app.DB_GROUP_COMMIT_WAIT_MS)
+    writes_parser.set_defaults(func=bench_writes)
+
+    flow_parser = sub.add_parser("flow", help="To'liq FSM oqimi: updates/s, kechikish, DB ulushi")
+    flow_parser.add_argument("--users", type=int, default=500)
+    flow_parser.add_argument("--rounds", type=int, default=1, help="har bir foydalanuvchi murojaatlari")
+    flow_parser.add_argument("--reply-ratio", type=float, default=1.0, help="javob beriladigan ulush")
+    flow_parser.add_argument("--latency", type=float, default=0.0, help="soxta API kechikishi (s)")
+    flow_parser.add_argument("--think", type=float, default=0.0, help="qadamlar orasidagi tasodifiy pauza (s)")
+    flow_parser.add_argument("--rate-limits", action="store_true", help="SendScheduler limitlari bilan")
+    flow_parser.add_argument("--group-commit", action="store_true", default=app.DB_GROUP_COMMIT)
+    flow_parser.add_argument("--output", help="natijalarni JSON faylga yozish")
+    flow_parser.set_defaults(func=bench_flow)
+
+    search_parser = sub.add_parser("search", help="FTS5 qidiruv kechikishi")
+    search_parser.add_argument("--rows", type=int, default=200000)
+    search_parser.add_argument("--calls", type=int, default=50)
+    search_parser.set_defaults(func=bench_search)
+
+    args = parser.parse_args()
+    asyncio.run(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
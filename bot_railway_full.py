@@ -1,23 +1,56 @@
 import asyncio
+import bisect
+import csv
+import hashlib
+import contextvars
+import functools
+import heapq
+import html
+import inspect
+import itertools
+import json
 import logging
+import multiprocessing
 import os
 import re
+import secrets
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime, timedelta
-from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import CommandStart, Command
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from aiogram import BaseMiddleware, Bot, Dispatcher, types, F
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.types import (
     InlineKeyboardMarkup, InlineKeyboardButton,
     ReplyKeyboardMarkup, KeyboardButton,
-    CallbackQuery, Message, FSInputFile
+    CallbackQuery, Message, FSInputFile, PhotoSize
 )
 import aiosqlite
+from aiohttp import web
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import PieChart, BarChart, Reference
+from openpyxl.chart.label import DataLabelList
+from openpyxl.chart.series import SeriesLabel
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow bo'lmasa faqat original saqlanadi
+    Image = None
 
 # ==================== SOZLAMALAR ====================
 # Railway environment variables dan olinadi
@@ -36,10 +69,82 @@ CATEGORY_GROUPS = {
 
 # Qo'shimcha sozlamalar
 DAILY_LIMIT = int(os.getenv("DAILY_LIMIT", "1"))
+# Kunlik limit shu vaqt zonasidagi yarim tunda yangilanadi
+QUOTA_TIMEZONE = os.getenv("QUOTA_TIMEZONE", "Asia/Tashkent")
 REMINDER_DAYS = int(os.getenv("REMINDER_DAYS", "15"))
+# Eskalatsiya bosqichlari (kun), masalan: "15,20,30"
+ESCALATION_TIERS = sorted({
+    float(days) for days in os.getenv("ESCALATION_TIERS", str(REMINDER_DAYS)).split(",") if days.strip()
+})
 DB_PATH = os.getenv("DB_PATH", "murojaatlar.db")
 MEDIA_PATH = os.getenv("MEDIA_PATH", "media_photos")
 DEFAULT_IMAGE = "default_image.png"
+# Foydalanuvchi rasmlarini fonda MEDIA_PATH ga arxivlash
+MEDIA_ARCHIVE = os.getenv("MEDIA_ARCHIVE", "1").lower() in ("1", "true", "yes")
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+# Rasm nusxalari: nom -> eng katta tomoni (px)
+MEDIA_VARIANTS = {"web": 1280, "thumb": 320}
+# Media tozalash: disk limiti, javob berilgan murojaat originallari saqlanish muddati
+MEDIA_QUOTA_MB = int(os.getenv("MEDIA_QUOTA_MB", "1024"))
+MEDIA_RETENTION_DAYS = int(os.getenv("MEDIA_RETENTION_DAYS", "90"))
+MEDIA_GC_INTERVAL = int(os.getenv("MEDIA_GC_INTERVAL", "3600"))  # soniya
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+# Javob berilganiga ARCHIVE_AFTER_DAYS dan oshgan murojaatlar arxiv fayliga ko'chiriladi (0 - o'chiq)
+ARCHIVE_DB_PATH = os.getenv("ARCHIVE_DB_PATH", str(Path(DB_PATH).with_name(f"{Path(DB_PATH).stem}_archive.db")))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "86400"))  # soniya
+# SQLite sozlamalari (har bir ulanish ochilganda qo'llanadi)
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_MB = int(os.getenv("DB_CACHE_MB", "16"))
+DB_MMAP_MB = int(os.getenv("DB_MMAP_MB", "64"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_TEMP_STORE = os.getenv("DB_TEMP_STORE", "MEMORY")
+DB_CHECKPOINT_INTERVAL = int(os.getenv("DB_CHECKPOINT_INTERVAL", "600"))  # soniya
+DB_OPTIMIZE_INTERVAL = int(os.getenv("DB_OPTIMIZE_INTERVAL", "21600"))  # soniya
+# So'rovlar profili: har bir SQL statement vaqti, sekinlari log ga yoziladi
+DB_PROFILE = os.getenv("DB_PROFILE", "1").lower() in ("1", "true", "yes")
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "50"))
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "60"))
+MY_PAGE_SIZE = 10
+SEARCH_PAGE_SIZE = 5
+# Jami natijalar shu songacha sanaladi; ko'prog'i bm25 siz, yangilari birinchi
+SEARCH_COUNT_LIMIT = 1000
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", "10000"))
+# FSM holatlari: "sqlite" (redeploy dan keyin saqlanadi) yoki "memory"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.2"))
+# Group commit: yozuvlar navbatdan olinib bitta tranzaksiyada commit qilinadi
+DB_GROUP_COMMIT = os.getenv("DB_GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+DB_GROUP_COMMIT_BATCH = int(os.getenv("DB_GROUP_COMMIT_BATCH", "64"))
+DB_GROUP_COMMIT_WAIT_MS = float(os.getenv("DB_GROUP_COMMIT_WAIT_MS", "2"))
+
+# Update qabul qilish: "polling" yoki "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # masalan: https://bot.up.railway.app
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8080"))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "64"))
+
+# Telegram yuborish limitlari
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))  # xabar/soniya, jami
+SEND_PRIVATE_RATE = float(os.getenv("SEND_PRIVATE_RATE", "1"))  # xabar/soniya, bitta chat
+SEND_GROUP_PER_MINUTE = float(os.getenv("SEND_GROUP_PER_MINUTE", "20"))  # xabar/daqiqa, bitta guruh
+SEND_BURST = int(os.getenv("SEND_BURST", "3"))
+SEND_PRIVATE_BURST = int(os.getenv("SEND_PRIVATE_BURST", "3"))  # shaxsiy chatga darhol ketadigan xabarlar
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+# Export ishchisi: "thread" yoki "process"
+EXPORT_EXECUTOR = os.getenv("EXPORT_EXECUTOR", "thread")
+EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "200"))
+TELEGRAM_TEXT_LIMIT = 4096
+
+# Prometheus /metrics endpoint (0 - o'chirilgan)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
 
 # ==================== LOGGING ====================
 logging.basicConfig(
@@ -48,9 +153,535 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ==================== METRIKALAR ====================
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+class Histogram:
+    """Prometheus histogram (label qiymatlari bo'yicha)"""
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}
+    
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket"
+                             f"{format_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            label_text = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+class Counter:
+    """Prometheus counter"""
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+    
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Gauge:
+    """Prometheus gauge: qiymat o'qish paytida ``collect`` dan olinadi
+
+    ``collect`` son yoki {label qiymatlari (tuple): son} qaytaradi.
+    """
+    
+    def __init__(self, name: str, documentation: str, collect, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.labelnames = labelnames
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"❌ Metrika {self.name} xatolik: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class MetricsRegistry:
+    """Barcha metrikalar va Prometheus text formatida chiqarish"""
+    
+    def __init__(self):
+        self._metrics = {}
+    
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+HANDLER_SECONDS = metrics.register(Histogram(
+    "bot_handler_seconds", "Handler ishlash vaqti", ("handler",)))
+HANDLER_ERRORS = metrics.register(Counter(
+    "bot_handler_errors_total", "Handlerdan chiqqan xatoliklar", ("handler",)))
+DB_SECONDS = metrics.register(Histogram(
+    "bot_db_seconds", "Database metodlari vaqti", ("method",), DB_BUCKETS))
+API_SECONDS = metrics.register(Histogram(
+    "bot_api_seconds", "Bot API so'rovlari vaqti (navbatsiz)", ("method",)))
+API_ERRORS = metrics.register(Counter(
+    "bot_api_errors_total", "Bot API xatoliklari", ("method", "error")))
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Handler bo'yicha kechikish va xatoliklar (dispatcher inner middleware)"""
+    
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, name)
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot API so'rovlari kechikishi va xatoliklari (sessiya middleware)"""
+    
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - start, name)
+
+def instrument_methods(cls, histogram: Histogram):
+    """Klassning ochiq async metodlari vaqtini o'lchash"""
+    for name, func in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(func):
+            continue
+        
+        def wrap(func, name=name):
+            @functools.wraps(func)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, name)
+            return timed
+        
+        setattr(cls, name, wrap(func))
+    return cls
+
+# ==================== FSM STORAGE ====================
+class SQLiteStorage(BaseStorage):
+    """Bot database faylida saqlanadigan FSM storage
+
+    Holatlar xotirada turadi va o'qish database ga murojaat qilmaydi.
+    O'zgarishlar yig'ilib, ``flush_interval`` oralig'ida bitta tranzaksiyada
+    yoziladi (write-behind), shuning uchun har bir xabar alohida fsync
+    qilmaydi. ``start`` startda saqlangan holatlarni yuklaydi, ``close``
+    qolgan o'zgarishlarni yozib tugatadi.
+    """
+    
+    def __init__(self, flush_interval: float = FSM_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.database = None
+        self._records = {}
+        self._dirty = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+    
+    @staticmethod
+    def _key_to_str(key: StorageKey) -> str:
+        return json.dumps([key.bot_id, key.chat_id, key.user_id, key.thread_id,
+                           key.business_connection_id, key.destiny])
+    
+    @staticmethod
+    def _key_from_str(raw: str) -> StorageKey:
+        bot_id, chat_id, user_id, thread_id, business_connection_id, destiny = json.loads(raw)
+        return StorageKey(bot_id=bot_id, chat_id=chat_id, user_id=user_id, thread_id=thread_id,
+                          business_connection_id=business_connection_id, destiny=destiny)
+    
+    async def start(self, database):
+        """Jadvalni yaratish, holatlarni yuklash va yozuvchi vazifani boshlash"""
+        self.database = database
+        async with database.writer() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS fsm_states (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        async with database.reader() as conn:
+            async with conn.execute("SELECT key, state, data FROM fsm_states") as cursor:
+                for row in await cursor.fetchall():
+                    self._records[self._key_from_str(row['key'])] = {
+                        'state': row['state'],
+                        'data': json.loads(row['data']) if row['data'] else {}
+                    }
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ FSM storage: {len(self._records)} ta holat tiklandi")
+    
+    def _mark(self, key: StorageKey):
+        self._dirty.add(key)
+        self._wakeup.set()
+    
+    @property
+    def pending_writes(self) -> int:
+        return len(self._dirty)
+    
+    def state_counts(self) -> dict:
+        """Holat bo'yicha faol sessiyalar soni"""
+        counts = {}
+        for record in self._records.values():
+            if record['state']:
+                counts[record['state']] = counts.get(record['state'], 0) + 1
+        return counts
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._records.setdefault(key, {'state': None, 'data': {}})
+        record['state'] = state.state if isinstance(state, State) else state
+        self._mark(key)
+    
+    async def get_state(self, key: StorageKey):
+        record = self._records.get(key)
+        return record['state'] if record else None
+    
+    async def set_data(self, key: StorageKey, data: dict) -> None:
+        record = self._records.setdefault(key, {'state': None, 'data': {}})
+        record['data'] = data.copy()
+        self._mark(key)
+    
+    async def get_data(self, key: StorageKey) -> dict:
+        record = self._records.get(key)
+        return record['data'].copy() if record else {}
+    
+    async def _run(self):
+        """O'zgarishlarni yig'ib, davriy yozish"""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await self.flush()
+    
+    async def flush(self):
+        """Yig'ilgan o'zgarishlarni bitta tranzaksiyada yozish"""
+        if not self._dirty or self.database is None:
+            return
+        dirty, self._dirty = self._dirty, set()
+        upserts = []
+        deletes = []
+        written = set()
+        for key in dirty:
+            record = self._records.get(key)
+            if record is None or (record['state'] is None and not record['data']):
+                self._records.pop(key, None)
+                deletes.append((self._key_to_str(key),))
+            else:
+                try:
+                    data = json.dumps(record['data'], ensure_ascii=False)
+                except (TypeError, ValueError) as e:
+                    # Qayta navbatga qo'yilmaydi: har safar shu xato takrorlanadi
+                    logger.error(f"❌ FSM holatini saqlab bo'lmadi (chat={key.chat_id}, user={key.user_id}): {e}")
+                    continue
+                upserts.append((self._key_to_str(key), record['state'], data))
+            written.add(key)
+        try:
+            async with self.database.writer() as conn:
+                if upserts:
+                    await conn.executemany("""
+                        INSERT INTO fsm_states (key, state, data) VALUES (?, ?, ?)
+                        ON CONFLICT(key) DO UPDATE SET
+                            state = excluded.state,
+                            data = excluded.data,
+                            updated_at = CURRENT_TIMESTAMP
+                    """, upserts)
+                if deletes:
+                    await conn.executemany("DELETE FROM fsm_states WHERE key = ?", deletes)
+        except Exception as e:
+            logger.error(f"❌ FSM storage yozish xatolik: {e}")
+            self._dirty |= written
+    
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+def create_fsm_storage() -> BaseStorage:
+    """FSM_STORAGE bo'yicha storage tanlash"""
+    if FSM_STORAGE == "memory":
+        return MemoryStorage()
+    return SQLiteStorage()
+
+# ==================== XABAR YUBORISH NAVBATI ====================
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Joriy vazifadagi yuborishlar ustuvorligi (eslatmalar uchun PRIORITY_BULK)
+send_priority = contextvars.ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+@asynccontextmanager
+async def bulk_sends():
+    """Blok ichidagi yuborishlarni ommaviy (past ustuvor) deb belgilash"""
+    token = send_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+class TokenBucket:
+    """Token bucket: ``rate`` token/soniya, ``capacity`` gacha to'planadi"""
+    
+    # Vaqt o'lchashdagi siljishlar uchun zaxira
+    SAFETY = 0.9
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+    
+    @classmethod
+    def for_limit(cls, limit: float, window: float, burst: int):
+        """Istalgan ``window`` oralig'ida ``limit`` tadan oshirmaydigan bucket
+
+        ``burst`` ta token darhol, qolgani ``window`` davomida tiklanadi:
+        burst + rate * window - 1 <= limit.
+        """
+        burst = max(1, min(burst, int(limit)))
+        return cls((limit - burst + 1) / window * cls.SAFETY, burst)
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, now: float) -> float:
+        """Keyingi token uchun kutish vaqti (0 bo'lsa hozir mumkin)"""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+    
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+    
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class SendScheduler(BaseRequestMiddleware):
+    """Chiquvchi Telegram so'rovlari uchun markaziy navbat
+
+    Bot sessiyasiga middleware sifatida ulanadi, shuning uchun chatga
+    yuboriladigan barcha so'rovlar (send_*, answer, reply, edit_*) shu
+    yerdan o'tadi. Umumiy va har bir chat uchun token bucket limitlari
+    saqlanadi, navbatda interaktiv javoblar ommaviy xabarlardan oldin
+    o'tadi. TelegramRetryAfter da chat to'xtatiladi va so'rov qayta
+    navbatga qo'yiladi.
+    """
+    
+    THROTTLED_PREFIXES = ("Send", "Copy", "Forward", "EditMessage")
+    MAX_CHAT_BUCKETS = 10000
+    
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE,
+                 private_rate: float = SEND_PRIVATE_RATE,
+                 group_per_minute: float = SEND_GROUP_PER_MINUTE,
+                 burst: int = SEND_BURST,
+                 private_burst: int = SEND_PRIVATE_BURST,
+                 max_retries: int = SEND_MAX_RETRIES):
+        self.global_bucket = TokenBucket.for_limit(global_rate, 1.0, burst)
+        self.private_rate = private_rate
+        self.private_burst = max(1, private_burst)
+        self.group_per_minute = group_per_minute
+        self.burst = burst
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._queue = []
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._pump_task = None
+        self.sent = 0
+        self.retried = 0
+    
+    def _prune_buckets(self):
+        """To'liq va bo'sh turgan chat bucketlarini tashlash (yangisi bilan bir xil)"""
+        now = time.monotonic()
+        waiting = {entry[2] for entry in self._queue}
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            bucket._refill(now)
+            if (chat_id not in waiting and bucket.tokens >= bucket.capacity
+                    and bucket.paused_until <= now):
+                del self._chat_buckets[chat_id]
+    
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+    
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self._prune_buckets()
+            if isinstance(chat_id, int) and chat_id > 0:
+                # O'rtacha private_rate, lekin ketma-ket javoblar (masalan, murojaat
+                # yakunidagi xabarlar) bir-birini kutmaydi: 1 s da ko'pi bilan
+                # private_burst + private_rate
+                bucket = TokenBucket(self.private_rate * TokenBucket.SAFETY, self.private_burst)
+            else:
+                bucket = TokenBucket.for_limit(self.group_per_minute, 60.0, self.burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+    
+    async def acquire(self, chat_id, priority: int):
+        """Navbatda turib, yuborishga ruxsat olish"""
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._queue, (priority, self._seq, chat_id, future))
+        self._wakeup.set()
+        await future
+    
+    async def _pump(self):
+        """Ustuvorlik tartibida, limitlar ruxsat berganda so'rovlarni o'tkazish"""
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            now = time.monotonic()
+            delay = self.global_bucket.wait_time(now)
+            chosen = None
+            if delay <= 0:
+                delay = None
+                blocked = []
+                waits = {}
+                while self._queue:
+                    entry = heapq.heappop(self._queue)
+                    if entry[3].done():
+                        # Bekor qilingan kutuvchi navbatdan tushadi
+                        continue
+                    wait = waits.get(entry[2])
+                    if wait is None:
+                        wait = waits[entry[2]] = self._chat_bucket(entry[2]).wait_time(now)
+                    if wait <= 0:
+                        chosen = entry
+                        break
+                    blocked.append(entry)
+                    delay = wait if delay is None else min(delay, wait)
+                # Limitdagi chatlar navbatga qaytadi (butun navbat qayta saralanmaydi)
+                for entry in blocked:
+                    heapq.heappush(self._queue, entry)
+            
+            if chosen is not None:
+                self.global_bucket.consume(now)
+                self._chat_bucket(chosen[2]).consume(now)
+                chosen[3].set_result(None)
+                continue
+            
+            if not self._queue:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not type(method).__name__.startswith(self.THROTTLED_PREFIXES):
+            return await make_request(bot, method)
+        
+        priority = send_priority.get()
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(chat_id, priority)
+            try:
+                response = await make_request(bot, method)
+                self.sent += 1
+                return response
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.retried += 1
+                # Qayta urinishlarda kutish ikki barobar oshadi
+                delay = e.retry_after * (2 ** attempt)
+                self._chat_bucket(chat_id).pause(delay)
+                logger.warning(f"⚠️ Flood limit: chat={chat_id}, {delay}s kutiladi")
+    
+    async def close(self):
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+        for entry in self._queue:
+            if not entry[3].done():
+                entry[3].cancel()
+        self._queue = []
+
 # ==================== BOT VA DISPATCHER ====================
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+send_scheduler = SendScheduler()
+bot.session.middleware(send_scheduler)
+# Navbatdan keyin: faqat so'rovning o'zi o'lchanadi
+bot.session.middleware(ApiMetricsMiddleware())
+fsm_storage = create_fsm_storage()
+dp = Dispatcher(storage=fsm_storage)
+dp.message.middleware(HandlerMetricsMiddleware())
+dp.callback_query.middleware(HandlerMetricsMiddleware())
 
 # ==================== VALIDATSIYA FUNKSIYALARI ====================
 def validate_passport(passport: str) -> bool:
@@ -81,22 +712,675 @@ def get_target_group(category: str) -> int:
     """Kategoriyaga mos guruh ID ni qaytarish"""
     return CATEGORY_GROUPS.get(category, GROUP_CHAT_ID)
 
-def get_all_group_ids() -> list:
+ALL_GROUP_IDS = frozenset(CATEGORY_GROUPS.values())
+
+def get_all_group_ids() -> frozenset:
     """Barcha guruh ID larini olish"""
-    return list(set(CATEGORY_GROUPS.values()))
+    return ALL_GROUP_IDS
+
+def get_group_categories(chat_id: int) -> list:
+    """Guruhga yo'naltirilgan kategoriyalar"""
+    return [category for category, group_id in CATEGORY_GROUPS.items() if group_id == chat_id]
+
+def load_timezone(name: str) -> ZoneInfo:
+    """Vaqt zonasini yuklash, topilmasa UTC"""
+    try:
+        return ZoneInfo(name)
+    except Exception as e:
+        logger.error(f"❌ Vaqt zonasi topilmadi ({name}): {e}, UTC ishlatiladi")
+        return ZoneInfo("UTC")
+
+LOCAL_TZ = load_timezone(QUOTA_TIMEZONE)
+
+def local_today():
+    """Mahalliy vaqt zonasidagi bugungi sana"""
+    return datetime.now(LOCAL_TZ).date()
+
+def date_start_utc(day) -> str:
+    """Berilgan mahalliy sana yarim tuni, UTC CURRENT_TIMESTAMP formatida"""
+    midnight = datetime.combine(day, datetime.min.time(), tzinfo=LOCAL_TZ)
+    return midnight.astimezone(ZoneInfo("UTC")).strftime('%Y-%m-%d %H:%M:%S')
+
+def day_start_utc(days_ago: int = 0) -> str:
+    """Mahalliy yarim tun (days_ago kun oldin), UTC CURRENT_TIMESTAMP formatida"""
+    return date_start_utc(local_today() - timedelta(days=days_ago))
+
+# ==================== KESH ====================
+class LRUCache:
+    """Hajmi cheklangan LRU kesh"""
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+    
+    def get(self, key, default=None):
+        try:
+            self._data.move_to_end(key)
+            return self._data[key]
+        except KeyError:
+            return default
+    
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def __len__(self):
+        return len(self._data)
+
+# (guruh chat_id, guruh xabari id) -> (murojaat id, user id)
+reply_cache = LRUCache(REPLY_CACHE_SIZE)
+# /search sahifalari uchun: token -> qidiruv parametrlari
+search_sessions = LRUCache(1000)
 
 # ==================== MA'LUMOTLAR BAZASI ====================
+def union_sql(template: str, schemas=("main",)) -> str:
+    """``{schema}`` li so'rovni har bir schema uchun UNION ALL bilan birlashtirish
+
+    Arxiv (ATTACH qilingan) jadvallari asosiy database dagi VIEW da
+    ishlatilib bo'lmaydi, TEMP VIEW esa ORDER BY ... LIMIT da har bir
+    qismning indeks tartibidan foydalanmaydi. Har bir qism o'z indeksi
+    bilan o'qiladi va SQLite ularni tartib bo'yicha birlashtiradi
+    (MERGE). Parametrlar har bir schema uchun takrorlanadi.
+    """
+    return "\nUNION ALL\n".join(template.replace("{schema}", schema) for schema in schemas)
+
+def stats_sql(where: str = "", schemas=("main",)) -> str:
+    """Bitta o'tishli statistika so'rovi: kategoriya bo'yicha shartli yig'indilar
+
+    Birinchi ikki parametr: bugun va 7 kun oldingi yarim tun (UTC).
+    Bir nechta schema bo'lsa, ``where`` parametrlari har biri uchun keladi.
+    """
+    source = f"{schemas[0]}.murojaatlar"
+    if len(schemas) > 1:
+        source = f"({union_sql(f'SELECT category, status, created_at FROM {{schema}}.murojaatlar {where}', schemas)})"
+        where = ""
+    return f"""
+        SELECT category,
+               COUNT(*) AS count,
+               SUM(status = 'Javob berildi') AS answered,
+               SUM(status = 'Yangi') AS pending,
+               SUM(created_at >= ?) AS today,
+               SUM(created_at >= ?) AS weekly
+        FROM {source}
+        {where}
+        GROUP BY category
+    """
+
+def rows_to_stats(rows, *extra) -> dict:
+    """Statistika so'rovi natijasini yig'ish
+
+    ``extra`` - qo'shimcha qatorlar (masalan, arxiv), kategoriya bo'yicha qo'shiladi.
+    """
+    if extra:
+        merged = {}
+        for row in itertools.chain(rows, *extra):
+            total = merged.setdefault(row['category'], dict.fromkeys(
+                ('count', 'answered', 'pending', 'today', 'weekly'), 0))
+            for key in total:
+                total[key] += row[key] or 0
+        rows = [{'category': category, **totals} for category, totals in merged.items()]
+    return {
+        'total': sum(row['count'] for row in rows),
+        'answered': sum(row['answered'] for row in rows),
+        'pending': sum(row['pending'] for row in rows),
+        'today': sum(row['today'] for row in rows),
+        'weekly': sum(row['weekly'] for row in rows),
+        'categories': sorted(
+            ({'category': row['category'], 'count': row['count']} for row in rows),
+            key=lambda c: c['count'],
+            reverse=True
+        )
+    }
+
+TREND_DAYS = (30, 90)
+
+def local_day_modifier() -> str:
+    """Mahalliy vaqt zonasi siljishi SQLite date() modifikatori sifatida ('+300 minutes')
+
+    Kunlik yig'indilar triggerlarida ishlatiladi. Yozgi vaqtli zonalarda
+    siljish hozirgi vaqt bo'yicha olinadi.
+    """
+    offset = datetime.now(LOCAL_TZ).utcoffset()
+    return f"{int(offset.total_seconds() // 60):+d} minutes"
+
+def trend_filters(filters: dict = None) -> dict:
+    """Export filtrlaridan kunlik yig'indilarga tegishlilari: kategoriya va status"""
+    return {key: value for key, value in (filters or {}).items() if key in ('categories', 'status')}
+
+def trend_params(days: int, filters: dict = None) -> list:
+    _, params = export_filter_sql(trend_filters(filters))
+    return [(local_today() - timedelta(days=days - 1)).isoformat()] + params
+
+def trend_sql(filters: dict = None) -> str:
+    """Kunlik yig'indilar (murojaatlar_daily) dan birinchi kundan boshlab qatorlar
+
+    Birinchi parametr: 'YYYY-MM-DD' mahalliy sana. Filtrdan faqat
+    kategoriya va status olinadi (yig'indilarda vaqt yo'q).
+    """
+    clauses, _ = export_filter_sql(trend_filters(filters))
+    where = "".join(f" AND {clause}" for clause in clauses)
+    return f"""
+        SELECT day, category, status, count
+        FROM murojaatlar_daily
+        WHERE day >= ?{where}
+    """
+
+def rows_to_trend(rows, days: int) -> dict:
+    """Oxirgi ``days`` kun: har kun uchun jami va javob berilganlar, kategoriyalar
+
+    Murojaat bo'lmagan kunlar ham 0 bilan qatnashadi.
+    """
+    first_day = local_today() - timedelta(days=days - 1)
+    daily = {(first_day + timedelta(days=i)).isoformat(): [0, 0] for i in range(days)}
+    categories = {}
+    for row in rows:
+        counts = daily.get(row['day'])
+        if counts is None:
+            continue
+        counts[0] += row['count']
+        if row['status'] == 'Javob berildi':
+            counts[1] += row['count']
+        categories[row['category']] = categories.get(row['category'], 0) + row['count']
+    return {
+        'days': [(day, total, answered) for day, (total, answered) in daily.items()],
+        'total': sum(total for total, _ in daily.values()),
+        'answered': sum(answered for _, answered in daily.values()),
+        'categories': sorted(
+            ({'category': category, 'count': count} for category, count in categories.items() if count),
+            key=lambda c: c['count'],
+            reverse=True
+        )
+    }
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values) -> str:
+    """Sonlar qatorini bitta satrli grafikka aylantirish"""
+    values = list(values)
+    top = max(values, default=0)
+    if top <= 0:
+        return SPARK_CHARS[0] * len(values)
+    return "".join(SPARK_CHARS[round(v / top * (len(SPARK_CHARS) - 1))] for v in values)
+
+def connection_pragmas(readonly: bool = False) -> list:
+    """Ulanish ochilganda bajariladigan PRAGMA lar (DB_* sozlamalari)"""
+    pragmas = [
+        f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size = -{DB_CACHE_MB * 1024}",
+        f"PRAGMA mmap_size = {DB_MMAP_MB * 1024 * 1024}",
+        f"PRAGMA temp_store = {DB_TEMP_STORE}",
+    ]
+    if not readonly:
+        # journal_mode database faylida saqlanadi, uni faqat yozish ulanishi o'rnatadi
+        pragmas.insert(0, f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+        pragmas.append(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    return pragmas
+
+def params_shape(parameters) -> str:
+    """Parametrlar qiymatisiz, faqat turlari (log da shaxsiy ma'lumot bo'lmasligi uchun)"""
+    if not parameters:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+
+class QueryProfiler:
+    """SQL statement lar bo'yicha yig'ma hisob va sekin so'rovlar logi
+
+    Har bir statement (bo'shliqlar normallashtirilgan SQL) uchun soni,
+    jami va eng katta vaqt, qaytgan qatorlar va sekinlar soni saqlanadi.
+    ``slow_ms`` dan oshgan so'rov log ga yoziladi, birinchi marta esa
+    uning ``EXPLAIN QUERY PLAN`` i ham olinadi. Yozuvlar aiosqlite
+    ishchi threadlaridan keladi, shuning uchun lock bilan himoyalangan.
+    """
+    
+    EXPLAIN_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+    
+    def __init__(self, slow_ms: float = DB_SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._stats = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(sql: str) -> str:
+        return " ".join(sql.split())
+    
+    def record(self, conn: sqlite3.Connection, sql: str, parameters, elapsed: float, rows: int):
+        key = self.normalize(sql)
+        elapsed_ms = elapsed * 1000
+        slow = elapsed_ms >= self.slow_ms
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow': 0, 'plan': None
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['rows'] += rows
+            if slow:
+                entry['slow'] += 1
+            need_plan = slow and entry['plan'] is None
+            if need_plan:
+                entry['plan'] = ""  # boshqa thread qayta olmasligi uchun
+        
+        if not slow:
+            return
+        shape = "many" if parameters is None else params_shape(parameters)
+        logger.warning(f"🐢 Sekin so'rov: {elapsed_ms:.1f}ms, {rows} qator, params={shape}: {key[:300]}")
+        if need_plan and key.upper().startswith(self.EXPLAIN_PREFIXES) and parameters is not None:
+            try:
+                plan_rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+                plan = " | ".join(str(row[3]) for row in plan_rows)
+            except Exception as e:
+                plan = f"olinmadi: {e}"
+            with self._lock:
+                entry['plan'] = plan
+            logger.warning(f"🐢 So'rov rejasi: {plan}")
+    
+    def snapshot(self) -> list:
+        """(sql, hisob) ro'yxati, jami vaqt bo'yicha kamayish tartibida"""
+        with self._lock:
+            items = [(sql, dict(entry)) for sql, entry in self._stats.items()]
+        return sorted(items, key=lambda item: item[1]['total_ms'], reverse=True)
+    
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+query_profiler = QueryProfiler()
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Statement vaqtini (execute + fetch) va qaytgan qatorlarni o'lchaydigan cursor"""
+    
+    _profile = None
+    
+    def _finish(self):
+        profile = self._profile
+        if profile is None:
+            return
+        self._profile = None
+        sql, parameters, elapsed, rows = profile
+        if self.description is None:
+            rows = max(self.rowcount, 0)
+        query_profiler.record(self.connection, sql, parameters, elapsed, rows)
+    
+    def _add(self, elapsed: float, rows: int):
+        if self._profile is not None:
+            self._profile[2] += elapsed
+            self._profile[3] += rows
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._profile = [sql, parameters, time.perf_counter() - start, 0]
+        if self.description is None:
+            self._finish()
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._profile = [sql, None, time.perf_counter() - start, 0]
+        self._finish()
+        return self
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - start, 0 if row is None else 1)
+        if row is None:
+            self._finish()
+        return row
+    
+    def fetchmany(self, size: int = None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - start, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - start, len(rows))
+        self._finish()
+        return rows
+    
+    def close(self):
+        self._finish()
+        super().close()
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 ulanishi: barcha statement lar ProfiledCursor orqali"""
+    
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory() -> dict:
+    """sqlite3.connect uchun qo'shimcha argumentlar (DB_PROFILE)"""
+    return {"factory": ProfiledConnection} if DB_PROFILE else {}
+
 class Database:
-    """Database boshqaruvi"""
+    """Database boshqaruvi
+
+    Bitta uzoq umrli yozish ulanishi va cheklangan o'qish ulanishlari
+    hovuzi ``init_db`` da ochiladi va ``close`` da yopiladi.
+
+    ``group_commit`` yoqilsa, ``add_murojaat``, ``add_javob`` va
+    ``update_status`` yozuvlari navbatga tushadi: bitta yozuvchi vazifa
+    yig'ilgan amallarni (``batch_size`` gacha yoki ``wait_ms`` ichida)
+    bitta tranzaksiyada, har birini alohida SAVEPOINT da bajaradi va
+    commit dan keyin har bir chaqiruvchiga natijasini qaytaradi.
+    
+    Eski javob berilgan murojaatlar ``archive_path`` fayliga ko'chiriladi
+    (``archive_answered``). Arxiv o'qish ulanishlariga kerak bo'lganda
+    (``reader(archive=True)``) ATTACH qilinadi; foydalanuvchi tarixi,
+    qidiruv, export va statistika ``schemas`` bo'yicha ikkalasini ham
+    ko'radi. Javob kutayotgan va yangi murojaatlar bilan ishlovchi
+    so'rovlar faqat asosiy (kichik) jadvalda qoladi.
+    """
+    
+    # Asosiy so'rovlar shakliga mos indekslar
+    INDEXES = {
+        # get_murojaat_by_group_msg: har bir guruh javobida
+        'idx_murojaatlar_group_msg': "murojaatlar(group_message_id)",
+        # get_user_murojaatlar: user_id + ORDER BY created_at
+        'idx_murojaatlar_user_created': "murojaatlar(user_id, created_at)",
+        # get_pending_murojaatlar / send_reminders: status + created_at
+        'idx_murojaatlar_status_created': "murojaatlar(status, created_at)",
+        # Kunlik limit va statistika: created_at diapazoni
+        'idx_murojaatlar_created': "murojaatlar(created_at)",
+        # Kategoriya bo'yicha filtrlangan export
+        'idx_murojaatlar_category_created': "murojaatlar(category, created_at)",
+        # get_data_version: oxirgi status o'zgarishi
+        'idx_murojaatlar_checked': "murojaatlar(admin_checked_at)",
+        # Media dedup: bir xil Telegram rasmi qayta yuklanmaydi
+        'idx_media_unique': "media(file_unique_id)",
+        # MediaCollector: fayl murojaatga bog'langanmi
+        'idx_murojaatlar_image_hash': "murojaatlar(image_hash)",
+        'idx_murojaatlar_image_path': "murojaatlar(image_path)",
+        'idx_media_files_hash': "media_files(hash)",
+        # get_murojaat_javoblar: murojaat_id + ORDER BY created_at
+        'idx_javoblar_murojaat_created': "javoblar(murojaat_id, created_at)",
+    }
+    
+    # Arxivdagi so'rovlar: tarix, export, MediaCollector
+    ARCHIVE_INDEXES = {
+        'idx_murojaatlar_user_created': "murojaatlar(user_id, created_at)",
+        'idx_murojaatlar_created': "murojaatlar(created_at)",
+        'idx_murojaatlar_category_created': "murojaatlar(category, created_at)",
+        'idx_murojaatlar_image_hash': "murojaatlar(image_hash)",
+        'idx_murojaatlar_image_path': "murojaatlar(image_path)",
+        'idx_javoblar_murojaat_created': "javoblar(murojaat_id, created_at)",
+    }
     
     def __init__(self):
         self.db_path = DB_PATH
+        self.read_pool_size = DB_READ_POOL_SIZE
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._readers = None
+        self._reader_conns = []
+        self._stats_cache = None
+        self._stats_version = 0
+        self._listeners = []
+        self.group_commit = DB_GROUP_COMMIT
+        self.batch_size = DB_GROUP_COMMIT_BATCH
+        self.batch_wait = DB_GROUP_COMMIT_WAIT_MS / 1000
+        self._write_queue = None
+        self._committer = None
+        self.commits = 0
+        self.fts_enabled = False
+        self.archive_path = ARCHIVE_DB_PATH
+        self.archive_ready = False
+        self._archive_lock = asyncio.Lock()
+        self._archive_attached = set()
+        self._archive_stats = None
+        self._columns = {}
+    
+    def add_listener(self, listener):
+        """Yozuv hodisalari tinglovchisini qo'shish
+
+        Tinglovchida ``on_murojaat_added(id, category, created_ts)`` va
+        ``on_status_changed(id, old_status, new_status)`` bo'lishi mumkin.
+        """
+        self._listeners.append(listener)
+    
+    def _notify(self, event: str, *args):
+        for listener in self._listeners:
+            handler = getattr(listener, event, None)
+            if handler is None:
+                continue
+            try:
+                handler(*args)
+            except Exception as e:
+                logger.error(f"❌ Listener xatolik ({event}): {e}")
+    
+    async def _connect(self, readonly: bool = False):
+        """Yangi ulanish ochish va sozlash"""
+        if readonly:
+            uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+            conn = await aiosqlite.connect(uri, uri=True, **connection_factory())
+        else:
+            conn = await aiosqlite.connect(self.db_path, **connection_factory())
+        conn.row_factory = aiosqlite.Row
+        for pragma in connection_pragmas(readonly):
+            await conn.execute(pragma)
+        return conn
+    
+    async def open(self):
+        """Yozish ulanishi va o'qish hovuzini ochish"""
+        if self._writer is not None:
+            return
+        self._writer = await self._connect()
+        async with self._writer.execute("PRAGMA journal_mode") as cursor:
+            journal_mode = (await cursor.fetchone())[0]
+        self._readers = asyncio.Queue()
+        for _ in range(max(1, self.read_pool_size)):
+            conn = await self._connect(readonly=True)
+            self._reader_conns.append(conn)
+            self._readers.put_nowait(conn)
+        if self.group_commit:
+            self._write_queue = asyncio.Queue()
+            self._committer = asyncio.create_task(self._run_committer())
+        logger.info(f"✅ Database ulanishlari: 1 yozish + {len(self._reader_conns)} o'qish, "
+                    f"journal={journal_mode}{' (group commit)' if self.group_commit else ''}")
+    
+    async def close(self):
+        """Barcha ulanishlarni yopish"""
+        if self._committer is not None:
+            # Navbatdagi yozuvlar tugatiladi
+            self._write_queue.put_nowait(None)
+            await self._committer
+            self._committer = None
+            self._write_queue = None
+        for conn in self._reader_conns:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.error(f"❌ O'qish ulanishini yopish xatolik: {e}")
+        self._reader_conns = []
+        self._readers = None
+        self._archive_attached = set()
+        if self._writer is not None:
+            try:
+                await self.optimize()
+                await self._writer.close()
+            except Exception as e:
+                logger.error(f"❌ Yozish ulanishini yopish xatolik: {e}")
+            self._writer = None
+    
+    @property
+    def schemas(self) -> tuple:
+        """Murojaatlar joylashgan schema lar (``reader(archive=True)`` ulanishida)"""
+        return ("main", "archive") if self.archive_ready else ("main",)
+    
+    @asynccontextmanager
+    async def reader(self, archive: bool = False):
+        """Hovuzdan o'qish ulanishini olish (archive=True - arxiv ATTACH qilingan)"""
+        conn = await self._readers.get()
+        try:
+            if archive and self.archive_ready and conn not in self._archive_attached:
+                # Hovuz ulanishi main sxemasini jadvallar yaratilishidan oldin o'qigan
+                # bo'lishi mumkin: eskirgan sxemada murojaatlar yo'q bo'lsa, nomi
+                # schema siz so'rovlar arxivdagi jadvalga bog'lanib qoladi. main ni
+                # o'qish sxemani yangilaydi.
+                async with conn.execute("SELECT 1 FROM main.sqlite_master LIMIT 1"):
+                    pass
+                uri = f"{Path(self.archive_path).resolve().as_uri()}?mode=ro"
+                await conn.execute("ATTACH DATABASE ? AS archive", (uri,))
+                self._archive_attached.add(conn)
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+    
+    @asynccontextmanager
+    async def writer(self):
+        """Yozish ulanishi: oxirida commit, xatolikda rollback"""
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+                self.commits += 1
+            except BaseException:
+                await self._writer.rollback()
+                raise
+    
+    @asynccontextmanager
+    async def _archive_writer(self):
+        """Yozish ulanishiga arxivni vaqtincha ATTACH qilish"""
+        async with self._write_lock:
+            await self._writer.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        try:
+            yield
+        finally:
+            async with self._write_lock:
+                await self._writer.execute("DETACH DATABASE archive")
+    
+    async def checkpoint(self):
+        """WAL faylini asosiy faylga ko'chirish va qisqartirish"""
+        try:
+            async with self.writer() as db:
+                async with db.execute("PRAGMA wal_checkpoint(TRUNCATE)") as cursor:
+                    busy, log_pages, checkpointed = await cursor.fetchone()
+            if busy:
+                logger.warning(f"⚠️ WAL checkpoint to'liq bajarilmadi: {checkpointed}/{log_pages} sahifa")
+        except Exception as e:
+            logger.error(f"❌ WAL checkpoint xatolik: {e}")
+    
+    async def optimize(self):
+        """So'rov rejalari statistikasini yangilash (PRAGMA optimize)"""
+        try:
+            async with self.writer() as db:
+                await db.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.error(f"❌ PRAGMA optimize xatolik: {e}")
+    
+    @property
+    def write_queue_depth(self) -> int:
+        return self._write_queue.qsize() if self._write_queue is not None else 0
+    
+    async def _write(self, op):
+        """``op(conn)`` ni bitta tranzaksiyada bajarish va natijasini qaytarish
+
+        Group commit yoqilgan bo'lsa amal navbatga qo'yiladi va boshqa
+        amallar bilan birga commit qilinadi.
+        """
+        if self._write_queue is None:
+            async with self.writer() as db:
+                return await op(db)
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((op, future))
+        return await future
+    
+    async def _run_committer(self):
+        """Navbatdagi yozuvlarni guruhlab commit qilish"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._write_queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._write_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._write_queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                # Masalan rollback ham xato bersa: kutayotganlar xatoni oladi,
+                # navbat esa ishlashda davom etadi
+                logger.error(f"❌ Group commit navbati xatolik ({len(batch)} ta yozuv): {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    async def _commit_batch(self, batch: list):
+        """Amallarni SAVEPOINT lar bilan bitta tranzaksiyada bajarish"""
+        results = []
+        async with self._write_lock:
+            conn = self._writer
+            try:
+                if conn.in_transaction:
+                    # Oldingi partiya rollback qila olmagan bo'lsa
+                    await conn.rollback()
+                await conn.execute("BEGIN IMMEDIATE")
+                for op, future in batch:
+                    await conn.execute("SAVEPOINT write_op")
+                    try:
+                        results.append((future, await op(conn), None))
+                        await conn.execute("RELEASE write_op")
+                    except Exception as e:
+                        # Faqat shu amal bekor qilinadi
+                        await conn.execute("ROLLBACK TO write_op")
+                        await conn.execute("RELEASE write_op")
+                        results.append((future, None, e))
+                await conn.commit()
+                self.commits += 1
+            except Exception as e:
+                logger.error(f"❌ Group commit xatolik ({len(batch)} ta yozuv): {e}")
+                await conn.rollback()
+                results = [(future, None, e) for _, future in batch]
+        
+        for future, result, error in results:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
         
     async def init_db(self):
         """Database yaratish va jadvallarni sozlash"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("PRAGMA foreign_keys = OFF")
+            await self.open()
+            async with self.writer() as db:
                 
                 # Foydalanuvchilar jadvali
                 await db.execute("""
@@ -123,7 +1407,10 @@ class Database:
                         status TEXT DEFAULT 'Yangi',
                         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                         admin_checked_at DATETIME,
-                        group_message_id INTEGER
+                        group_message_id INTEGER,
+                        escalation_level INTEGER DEFAULT 0,
+                        image_file_id TEXT,
+                        image_hash TEXT
                     )
                 """)
                 
@@ -139,6 +1426,37 @@ class Database:
                     )
                 """)
                 
+                # Media fayllar (sha256 bo'yicha, MediaStore)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS media (
+                        hash TEXT PRIMARY KEY,
+                        file_unique_id TEXT,
+                        ext TEXT,
+                        size INTEGER,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Diskdagi media fayllar indeksi (MediaCollector uchun)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS media_files (
+                        path TEXT PRIMARY KEY,
+                        hash TEXT,
+                        kind TEXT,
+                        size INTEGER,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Bot sozlamalari (masalan, yuklangan rasmlarning file_id si)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS bot_settings (
+                        key TEXT PRIMARY KEY,
+                        value TEXT,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
                 # Migratsiya: ustunlarni tekshirish va qo'shish
                 try:
                     cursor = await db.execute("PRAGMA table_info(murojaatlar)")
@@ -148,7 +1466,10 @@ class Database:
                     required_columns = {
                         'address': 'TEXT',
                         'group_message_id': 'INTEGER',
-                        'admin_checked_at': 'DATETIME'
+                        'admin_checked_at': 'DATETIME',
+                        'escalation_level': 'INTEGER DEFAULT 0',
+                        'image_file_id': 'TEXT',
+                        'image_hash': 'TEXT'
                     }
                     
                     for col_name, col_type in required_columns.items():
@@ -163,47 +1484,270 @@ class Database:
                 except Exception as migration_error:
                     logger.error(f"❌ Migratsiya xatolik: {migration_error}")
                 
+                # Indekslar (migratsiyadan keyin: group_message_id ustuni kerak)
+                for index_name, index_target in self.INDEXES.items():
+                    await db.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_target}")
+                logger.info(f"✅ Indekslar tekshirildi: {len(self.INDEXES)} ta")
+                
+                self.fts_enabled = await self._create_fts(db)
+                daily_stale = await self._create_daily_rollup(db)
+                
+                for table in ("murojaatlar", "javoblar"):
+                    async with db.execute(f"PRAGMA main.table_info({table})") as cursor:
+                        self._columns[table] = [tuple(col) for col in await cursor.fetchall()]
+                
                 await db.commit()
-                logger.info("✅ Database tayyor")
+            
+            if ARCHIVE_AFTER_DAYS > 0 or os.path.exists(self.archive_path):
+                await self._init_archive()
+            if daily_stale:
+                await self.rebuild_daily_stats()
+            logger.info("✅ Database tayyor")
         except Exception as e:
             logger.error(f"❌ Database xatolik: {e}")
             raise
     
-    async def add_user(self, user_id: int, full_name: str, phone: str):
-        """Foydalanuvchi qo'shish"""
+    def column_names(self, table: str) -> str:
+        return ", ".join(col[1] for col in self._columns[table])
+    
+    async def _init_archive(self):
+        """Arxiv faylini yaratish: asosiy jadvallar ustunlari, indekslar va FTS"""
+        try:
+            async with self._archive_writer():
+                async with self.writer() as db:
+                    await db.execute(f"PRAGMA archive.journal_mode = {DB_JOURNAL_MODE}")
+                    for table, columns in self._columns.items():
+                        # (cid, name, type, notnull, default, pk)
+                        definitions = ", ".join(
+                            f"{col[1]} {col[2]}{' PRIMARY KEY' if col[5] else ''}" for col in columns
+                        )
+                        await db.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} ({definitions})")
+                        # Asosiy jadvalga keyin qo'shilgan ustunlar
+                        async with db.execute(f"PRAGMA archive.table_info({table})") as cursor:
+                            existing = {col[1] for col in await cursor.fetchall()}
+                        for col in columns:
+                            if col[1] not in existing:
+                                await db.execute(f"ALTER TABLE archive.{table} ADD COLUMN {col[1]} {col[2]}")
+                    for index_name, index_target in self.ARCHIVE_INDEXES.items():
+                        await db.execute(f"CREATE INDEX IF NOT EXISTS archive.{index_name} ON {index_target}")
+                    fts_ready = await self._create_fts(db, schema="archive")
+            self.fts_enabled = self.fts_enabled and fts_ready
+            self.archive_ready = True
+            logger.info(f"✅ Arxiv database: {self.archive_path}")
+        except Exception as e:
+            logger.error(f"❌ Arxiv database xatolik: {e}")
+    
+    @staticmethod
+    async def _upsert_user(db, user_id: int, full_name: str, phone: str):
+        """Foydalanuvchini yozish (created_at saqlanib qoladi)"""
+        await db.execute("""
+            INSERT INTO users (user_id, full_name, phone) VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET full_name = excluded.full_name,
+                                               phone = excluded.phone
+        """, (user_id, full_name, phone))
+    
+    @staticmethod
+    async def _insert_javob(db, murojaat_id: int, admin_id: int, admin_username: str, javob_text: str):
+        await db.execute("""
+            INSERT INTO javoblar (murojaat_id, admin_id, admin_username, javob_text)
+            VALUES (?, ?, ?, ?)
+        """, (murojaat_id, admin_id, admin_username, javob_text))
+    
+    @staticmethod
+    async def _set_status(db, murojaat_id: int, status: str):
+        """Statusni yangilash, eski statusni qaytaradi (murojaat topilmasa None)"""
+        async with db.execute(
+            "SELECT status FROM murojaatlar WHERE id = ?", (murojaat_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await db.execute(
+            "UPDATE murojaatlar SET status = ?, admin_checked_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (status, murojaat_id)
+        )
+        return row['status'] if row else None
+    
+    def _status_changed(self, murojaat_id: int, old_status: str, status: str):
+        if old_status is not None:
+            self._stats_on_status(old_status, status)
+            self._notify('on_status_changed', murojaat_id, old_status, status)
+    
+    async def _create_fts(self, db, schema: str = "main") -> bool:
+        """To'liq matnli qidiruv (FTS5): text va address, triggerlar bilan sinxron
+
+        Jadval birinchi marta yaratilganda mavjud murojaatlar indekslanadi.
+        Trigger va content jadvali shu ``schema`` ichida bo'ladi.
+        """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("PRAGMA foreign_keys = OFF")
+            async with db.execute(
+                f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'murojaatlar_fts'"
+            ) as cursor:
+                exists = await cursor.fetchone() is not None
+            
+            await db.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.murojaatlar_fts USING fts5(
+                    text, address,
+                    content='murojaatlar', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            await db.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {schema}.murojaatlar_fts_ai AFTER INSERT ON murojaatlar BEGIN
+                    INSERT INTO murojaatlar_fts (rowid, text, address)
+                    VALUES (new.id, new.text, new.address);
+                END
+            """)
+            await db.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {schema}.murojaatlar_fts_ad AFTER DELETE ON murojaatlar BEGIN
+                    INSERT INTO murojaatlar_fts (murojaatlar_fts, rowid, text, address)
+                    VALUES ('delete', old.id, old.text, old.address);
+                END
+            """)
+            await db.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {schema}.murojaatlar_fts_au
+                AFTER UPDATE OF text, address ON murojaatlar BEGIN
+                    INSERT INTO murojaatlar_fts (murojaatlar_fts, rowid, text, address)
+                    VALUES ('delete', old.id, old.text, old.address);
+                    INSERT INTO murojaatlar_fts (rowid, text, address)
+                    VALUES (new.id, new.text, new.address);
+                END
+            """)
+            
+            if not exists:
                 await db.execute(
-                    "INSERT OR REPLACE INTO users (user_id, full_name, phone) VALUES (?, ?, ?)",
-                    (user_id, full_name, phone)
+                    f"INSERT INTO {schema}.murojaatlar_fts (murojaatlar_fts, rank) VALUES ('rank', 'bm25(1.0, 0.5)')"
                 )
-                await db.commit()
-                logger.info(f"✅ User qo'shildi: {user_id}")
+                await db.execute(f"INSERT INTO {schema}.murojaatlar_fts (murojaatlar_fts) VALUES ('rebuild')")
+                logger.info(f"✅ Qidiruv indeksi (FTS5) yaratildi: {schema}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ FTS5 qidiruv indeksi yaratilmadi ({schema}): {e}")
+            return False
+    
+    async def _create_daily_rollup(self, db) -> bool:
+        """Kunlik yig'indilar: (mahalliy kun, kategoriya, status) bo'yicha murojaatlar soni
+
+        Triggerlar qo'shish va status/kategoriya o'zgarishida sonlarni
+        yangilaydi. O'chirish triggeri yo'q: arxivga ko'chirish tarixni
+        kamaytirmasligi kerak. Kun siljishi triggerga yoziladi; u
+        o'zgargan bo'lsa triggerlar qayta yaratiladi. Qaytaradi: yig'indilarni
+        qayta hisoblash kerakmi (``rebuild_daily_stats``).
+        """
+        modifier = local_day_modifier()
+        day_new = f"date(new.created_at, '{modifier}')"
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS murojaatlar_daily (
+                day TEXT,
+                category TEXT,
+                status TEXT,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, category, status)
+            ) WITHOUT ROWID
+        """)
+        async with db.execute(
+            "SELECT value FROM bot_settings WHERE key = 'daily_rollup_modifier'"
+        ) as cursor:
+            row = await cursor.fetchone()
+        stale = row is None or row[0] != modifier
+        if stale:
+            await db.execute("DROP TRIGGER IF EXISTS murojaatlar_daily_ai")
+            await db.execute("DROP TRIGGER IF EXISTS murojaatlar_daily_au")
+        await db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS murojaatlar_daily_ai AFTER INSERT ON murojaatlar BEGIN
+                INSERT INTO murojaatlar_daily (day, category, status, count)
+                VALUES ({day_new}, IFNULL(new.category, ''), IFNULL(new.status, ''), 1)
+                ON CONFLICT (day, category, status) DO UPDATE SET count = count + 1;
+            END
+        """)
+        await db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS murojaatlar_daily_au
+            AFTER UPDATE OF status, category, created_at ON murojaatlar
+            WHEN old.status IS NOT new.status OR old.category IS NOT new.category
+                 OR old.created_at IS NOT new.created_at
+            BEGIN
+                UPDATE murojaatlar_daily SET count = count - 1
+                WHERE day = date(old.created_at, '{modifier}')
+                  AND category = IFNULL(old.category, '') AND status = IFNULL(old.status, '');
+                INSERT INTO murojaatlar_daily (day, category, status, count)
+                VALUES ({day_new}, IFNULL(new.category, ''), IFNULL(new.status, ''), 1)
+                ON CONFLICT (day, category, status) DO UPDATE SET count = count + 1;
+            END
+        """)
+        return stale
+    
+    async def rebuild_daily_stats(self):
+        """Kunlik yig'indilarni murojaatlardan (arxiv bilan) qayta hisoblash
+
+        Bir martalik to'ldirish: jadval yangi bo'lsa yoki kun siljishi o'zgarganda.
+        """
+        modifier = local_day_modifier()
+        schemas = self.schemas
+        source = union_sql("SELECT created_at, category, status FROM {schema}.murojaatlar", schemas)
+        try:
+            async with self._archive_writer() if self.archive_ready else nullcontext():
+                async with self.writer() as db:
+                    await db.execute("DELETE FROM main.murojaatlar_daily")
+                    await db.execute(f"""
+                        INSERT INTO main.murojaatlar_daily (day, category, status, count)
+                        SELECT date(created_at, '{modifier}'), IFNULL(category, ''), IFNULL(status, ''), COUNT(*)
+                        FROM ({source})
+                        GROUP BY 1, 2, 3
+                    """)
+                    await db.execute("""
+                        INSERT INTO main.bot_settings (key, value) VALUES ('daily_rollup_modifier', ?)
+                        ON CONFLICT(key) DO UPDATE SET value = excluded.value,
+                                                       updated_at = CURRENT_TIMESTAMP
+                    """, (modifier,))
+            logger.info(f"✅ Kunlik statistika qayta hisoblandi ({modifier})")
+        except Exception as e:
+            logger.error(f"❌ Kunlik statistika xatolik: {e}")
+    
+    async def get_daily_trends(self, filters: dict = None) -> dict:
+        """TREND_DAYS davrlari uchun trendlar (kunlik yig'indilardan, jadval hajmiga bog'liq emas)"""
+        try:
+            async with self.reader() as db:
+                async with db.execute(
+                    trend_sql(filters), trend_params(max(TREND_DAYS), filters)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            return {days: rows_to_trend(rows, days) for days in TREND_DAYS}
+        except Exception as e:
+            logger.error(f"❌ Trend xatolik: {e}")
+            return None
+    
+    async def add_user(self, user_id: int, full_name: str, phone: str):
+        """Foydalanuvchi qo'shish"""
+        try:
+            await self._write(lambda db: self._upsert_user(db, user_id, full_name, phone))
+            logger.info(f"✅ User qo'shildi: {user_id}")
         except Exception as e:
             logger.error(f"❌ User qo'shish xatolik: {e}")
     
     async def add_murojaat(self, user_id: int, full_name: str, passport: str, 
                           phone: str, address: str, category: str, text: str, 
-                          image_path: str = None, group_message_id: int = None):
+                          image_path: str = None, group_message_id: int = None,
+                          image_file_id: str = None):
         """Murojaat qo'shish"""
         try:
             logger.info(f"💾 Murojaat saqlanmoqda: user={user_id}, group_msg={group_message_id}")
             
-            await self.add_user(user_id, full_name, phone)
-            
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("PRAGMA foreign_keys = OFF")
+            # User va murojaat bitta tranzaksiyada (bitta commit)
+            async def op(db):
+                await self._upsert_user(db, user_id, full_name, phone)
                 cursor = await db.execute("""
                     INSERT INTO murojaatlar 
-                    (user_id, full_name, passport, phone, address, category, text, image_path, group_message_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (user_id, full_name, passport, phone, address, category, text, image_path, group_message_id))
-                await db.commit()
-                murojaat_id = cursor.lastrowid
-                
-                logger.info(f"✅ Murojaat saqlandi: ID={murojaat_id}")
-                return murojaat_id
+                    (user_id, full_name, passport, phone, address, category, text, image_path,
+                     group_message_id, image_file_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (user_id, full_name, passport, phone, address, category, text, image_path,
+                      group_message_id, image_file_id))
+                return cursor.lastrowid
+            
+            murojaat_id = await self._write(op)
+            
+            self._stats_on_add(category)
+            self._notify('on_murojaat_added', murojaat_id, category, time.time())
+            logger.info(f"✅ Murojaat saqlandi: ID={murojaat_id}")
+            return murojaat_id
                 
         except Exception as e:
             logger.error(f"❌ Murojaat qo'shish xatolik: {e}")
@@ -212,13 +1756,16 @@ class Database:
             return None
     
     async def get_user_murojaatlar(self, user_id: int):
-        """Foydalanuvchi murojaatlari"""
+        """Foydalanuvchi murojaatlari (arxiv bilan)"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
+            async with self.reader(archive=True) as db:
+                schemas = self.schemas
                 async with db.execute(
-                    "SELECT * FROM murojaatlar WHERE user_id = ? ORDER BY created_at DESC",
-                    (user_id,)
+                    union_sql(
+                        f"SELECT {self.column_names('murojaatlar')} FROM {{schema}}.murojaatlar WHERE user_id = ?",
+                        schemas
+                    ) + " ORDER BY created_at DESC",
+                    (user_id,) * len(schemas)
                 ) as cursor:
                     rows = await cursor.fetchall()
                     return [dict(row) for row in rows]
@@ -226,14 +1773,219 @@ class Database:
             logger.error(f"❌ Get user murojaatlar xatolik: {e}")
             return []
     
+    async def get_user_murojaatlar_page(self, user_id: int, limit: int,
+                                        cursor_id: int = None, newer: bool = False):
+        """Foydalanuvchi murojaatlari sahifasi javoblar soni va oxirgi javob bilan
+
+        Keyset sahifalash (created_at, id) bo'yicha: ``cursor_id`` dan eskilari
+        yoki ``newer=True`` bo'lsa yangilari. Natija doim yangidan eskiga
+        tartiblangan bo'ladi. Arxivdagi murojaatlar ham kiradi.
+        Qaytaradi: (qatorlar, yana_bormi, jami).
+        """
+        try:
+            async with self.reader(archive=True) as db:
+                schemas = self.schemas
+                where = "m.user_id = ?"
+                arm_params = [user_id]
+                if cursor_id is not None:
+                    async with db.execute(
+                        union_sql("SELECT created_at FROM {schema}.murojaatlar WHERE id = ?", schemas),
+                        (cursor_id,) * len(schemas)
+                    ) as cursor:
+                        row = await cursor.fetchone()
+                    op = ">" if newer else "<"
+                    where += f" AND (m.created_at, m.id) {op} (?, ?)"
+                    arm_params += [row[0] if row else None, cursor_id]
+                order = "ASC" if newer else "DESC"
+                
+                async with db.execute(union_sql(f"""
+                    SELECT m.id, m.category, m.status, m.created_at,
+                           (SELECT COUNT(*) FROM {{schema}}.javoblar j
+                             WHERE j.murojaat_id = m.id) AS javob_count,
+                           (SELECT j.javob_text FROM {{schema}}.javoblar j
+                             WHERE j.murojaat_id = m.id
+                             ORDER BY j.created_at DESC, j.id DESC LIMIT 1) AS last_javob
+                    FROM {{schema}}.murojaatlar m
+                    WHERE {where}
+                """, schemas) + f"""
+                    ORDER BY created_at {order}, id {order}
+                    LIMIT ?
+                """, arm_params * len(schemas) + [limit + 1]) as cursor:
+                    rows = [dict(row) for row in await cursor.fetchall()]
+                
+                total = 0
+                if rows:
+                    async with db.execute(
+                        f"SELECT {' + '.join(f'(SELECT COUNT(*) FROM {schema}.murojaatlar WHERE user_id = ?)' for schema in schemas)}",
+                        (user_id,) * len(schemas)
+                    ) as cursor:
+                        total = (await cursor.fetchone())[0]
+            
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if newer:
+                rows.reverse()
+            return rows, has_more, total
+        except Exception as e:
+            logger.error(f"❌ Get user murojaatlar page xatolik: {e}")
+            return [], False, 0
+    
+    async def get_media_by_unique_id(self, file_unique_id: str):
+        """Oldin saqlangan rasm (hash, ext) - Telegram file_unique_id bo'yicha"""
+        try:
+            async with self.reader() as db:
+                async with db.execute(
+                    "SELECT hash, ext FROM media WHERE file_unique_id = ?", (file_unique_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                    return (row['hash'], row['ext']) if row else None
+        except Exception as e:
+            logger.error(f"❌ Media qidirish xatolik: {e}")
+            return None
+    
+    async def attach_media(self, murojaat_id: int, digest: str, ext: str, size: int,
+                           file_unique_id: str = None, files: list = ()):
+        """Rasmni media jadvaliga yozish va murojaatga bog'lash
+
+        ``files`` - diskka yozilgan fayllar: (path, kind, size).
+        """
+        try:
+            async with self.writer() as db:
+                await db.execute(
+                    "INSERT OR IGNORE INTO media (hash, file_unique_id, ext, size) VALUES (?, ?, ?, ?)",
+                    (digest, file_unique_id, ext, size)
+                )
+                await db.executemany(
+                    "INSERT OR IGNORE INTO media_files (path, hash, kind, size) VALUES (?, ?, ?, ?)",
+                    [(path, digest, kind, file_size) for path, kind, file_size in files]
+                )
+                await db.execute(
+                    "UPDATE murojaatlar SET image_hash = ? WHERE id = ?",
+                    (digest, murojaat_id)
+                )
+        except Exception as e:
+            logger.error(f"❌ Media saqlash xatolik: {e}")
+    
+    async def get_setting(self, key: str):
+        """Bot sozlamasini olish"""
+        try:
+            async with self.reader() as db:
+                async with db.execute("SELECT value FROM bot_settings WHERE key = ?", (key,)) as cursor:
+                    row = await cursor.fetchone()
+                    return row['value'] if row else None
+        except Exception as e:
+            logger.error(f"❌ Sozlamani olish xatolik: {e}")
+            return None
+    
+    async def set_setting(self, key: str, value: str = None):
+        """Bot sozlamasini saqlash (None - o'chirish)"""
+        try:
+            async with self.writer() as db:
+                if value is None:
+                    await db.execute("DELETE FROM bot_settings WHERE key = ?", (key,))
+                else:
+                    await db.execute("""
+                        INSERT INTO bot_settings (key, value) VALUES (?, ?)
+                        ON CONFLICT(key) DO UPDATE SET value = excluded.value,
+                                                       updated_at = CURRENT_TIMESTAMP
+                    """, (key, value))
+        except Exception as e:
+            logger.error(f"❌ Sozlamani saqlash xatolik: {e}")
+    
+    def _search_sql(self, categories: list = None, ranked: bool = False):
+        """Har bir schema dagi FTS5 natijalari: (src, id[, rank]), va qismlar soni
+
+        ``+m.category`` kategoriya indeksini o'chiradi: aks holda
+        rejalashtiruvchi har bir kategoriya qatori uchun FTS ni skan qiladi.
+        ``rank`` faqat kerak bo'lganda olinadi - u har bir qator uchun bm25 hisoblaydi.
+        """
+        category_sql = ""
+        if categories:
+            category_sql = f" AND +m.category IN ({', '.join('?' for _ in categories)})"
+        sql = union_sql(f"""
+            SELECT '{{schema}}' AS src, murojaatlar_fts.rowid AS id{', rank' if ranked else ''}
+            FROM {{schema}}.murojaatlar_fts
+            JOIN {{schema}}.murojaatlar m ON m.id = murojaatlar_fts.rowid
+            WHERE murojaatlar_fts MATCH ?{category_sql}
+        """, self.schemas)
+        return sql, len(self.schemas)
+    
+    async def count_search(self, match: str, categories: list = None) -> int:
+        """Qidiruv natijalari soni (arxiv bilan), SEARCH_COUNT_LIMIT + 1 gacha"""
+        try:
+            async with self.reader(archive=True) as db:
+                sql, arms = self._search_sql(categories)
+                async with db.execute(
+                    f"SELECT COUNT(*) FROM ({sql} LIMIT ?)",
+                    [match, *(categories or [])] * arms + [SEARCH_COUNT_LIMIT + 1]
+                ) as cursor:
+                    return (await cursor.fetchone())[0]
+        except Exception as e:
+            logger.error(f"❌ Qidiruv xatolik: {e}")
+            return 0
+    
+    async def search_murojaatlar(self, match: str, categories: list = None, limit: int = SEARCH_PAGE_SIZE,
+                                 offset: int = 0, ranked: bool = True):
+        """FTS5 qidiruv sahifasi (arxiv bilan): (qatorlar, keyingisi bormi)
+
+        ranked=True - bm25 bo'yicha; u barcha mos qatorlarni baholaydi, shuning
+        uchun juda ko'p natijali so'rovlar yangilari birinchi (rowid) beriladi.
+        Avval faqat sahifa id lari tanlanadi, snippet shu qatorlar uchungina olinadi.
+        """
+        try:
+            async with self.reader(archive=True) as db:
+                sql, arms = self._search_sql(categories, ranked)
+                async with db.execute(
+                    f"{sql} ORDER BY {'rank' if ranked else 'id DESC'} LIMIT ? OFFSET ?",
+                    [match, *(categories or [])] * arms + [limit + 1, offset]
+                ) as cursor:
+                    hits = [(row['src'], row['id']) for row in await cursor.fetchall()]
+                
+                found = {}
+                # Oxirgi (limit + 1) qator faqat keyingi sahifa borligini bildiradi
+                page = hits[:limit]
+                for schema in {src for src, _ in page}:
+                    ids = [murojaat_id for src, murojaat_id in page if src == schema]
+                    # Bitta MATCH, sahifa id lari oralig'ida; IN faqat filtr (+), aks holda
+                    # har bir id uchun alohida MATCH bajariladi
+                    async with db.execute(f"""
+                        SELECT m.id, m.created_at, m.category, m.status, m.address,
+                               snippet(murojaatlar_fts, 0, char(2), char(3), '…', 16) AS snippet
+                        FROM {schema}.murojaatlar_fts
+                        CROSS JOIN {schema}.murojaatlar m ON m.id = murojaatlar_fts.rowid
+                        WHERE murojaatlar_fts MATCH ?
+                          AND murojaatlar_fts.rowid BETWEEN ? AND ?
+                          AND +murojaatlar_fts.rowid IN ({', '.join('?' for _ in ids)})
+                    """, [match, min(ids), max(ids)] + ids) as cursor:
+                        found.update((row['id'], dict(row)) for row in await cursor.fetchall())
+            rows = [found[murojaat_id] for _, murojaat_id in page if murojaat_id in found]
+            return rows, len(hits) > limit
+        except Exception as e:
+            logger.error(f"❌ Qidiruv xatolik: {e}")
+            return [], False
+    
+    async def get_data_version(self):
+        """Hisobot keshi uchun ma'lumotlar versiyasi (indekslar orqali, skansiz)"""
+        async with self.reader() as db:
+            async with db.execute("""
+                SELECT (SELECT MAX(id) FROM murojaatlar),
+                       (SELECT MAX(id) FROM javoblar),
+                       (SELECT MAX(admin_checked_at) FROM murojaatlar)
+            """) as cursor:
+                row = await cursor.fetchone()
+        return tuple(row)
+    
     async def get_murojaat_javoblar(self, murojaat_id: int):
-        """Murojaat javoblari"""
+        """Murojaat javoblari (arxiv bilan)"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
+            async with self.reader(archive=True) as db:
+                schemas = self.schemas
                 async with db.execute(
-                    "SELECT * FROM javoblar WHERE murojaat_id = ? ORDER BY created_at DESC",
-                    (murojaat_id,)
+                    union_sql(
+                        f"SELECT {self.column_names('javoblar')} FROM {{schema}}.javoblar WHERE murojaat_id = ?",
+                        schemas
+                    ) + " ORDER BY created_at DESC",
+                    (murojaat_id,) * len(schemas)
                 ) as cursor:
                     rows = await cursor.fetchall()
                     return [dict(row) for row in rows]
@@ -244,8 +1996,7 @@ class Database:
     async def get_murojaat_by_group_msg(self, group_message_id: int):
         """Guruh xabari bo'yicha murojaatni topish"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
+            async with self.reader() as db:
                 async with db.execute(
                     "SELECT * FROM murojaatlar WHERE group_message_id = ?",
                     (group_message_id,)
@@ -259,49 +2010,61 @@ class Database:
     async def add_javob(self, murojaat_id: int, admin_id: int, admin_username: str, javob_text: str):
         """Javob qo'shish"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO javoblar (murojaat_id, admin_id, admin_username, javob_text)
-                    VALUES (?, ?, ?, ?)
-                """, (murojaat_id, admin_id, admin_username, javob_text))
-                await db.commit()
-                logger.info(f"✅ Javob saqlandi: murojaat_id={murojaat_id}")
+            await self._write(
+                lambda db: self._insert_javob(db, murojaat_id, admin_id, admin_username, javob_text)
+            )
+            logger.info(f"✅ Javob saqlandi: murojaat_id={murojaat_id}")
         except Exception as e:
             logger.error(f"❌ Javob qo'shish xatolik: {e}")
     
     async def update_status(self, murojaat_id: int, status: str):
         """Status yangilash"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "UPDATE murojaatlar SET status = ?, admin_checked_at = CURRENT_TIMESTAMP WHERE id = ?",
-                    (status, murojaat_id)
-                )
-                await db.commit()
-                logger.info(f"✅ Status yangilandi: #{murojaat_id} -> {status}")
+            old_status = await self._write(lambda db: self._set_status(db, murojaat_id, status))
+            self._status_changed(murojaat_id, old_status, status)
+            logger.info(f"✅ Status yangilandi: #{murojaat_id} -> {status}")
         except Exception as e:
             logger.error(f"❌ Status yangilash xatolik: {e}")
     
-    async def get_daily_count(self, user_id: int):
-        """Bugungi murojaatlar soni"""
+    async def add_javob_with_status(self, murojaat_id: int, admin_id: int, admin_username: str,
+                                    javob_text: str, status: str = "Javob berildi"):
+        """Javob qo'shish va statusni yangilash - bitta tranzaksiyada"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                today = datetime.now().strftime('%Y-%m-%d')
+            async def op(db):
+                old_status = await self._set_status(db, murojaat_id, status)
+                if old_status is None:
+                    # Arxivga ko'chirilgan (yoki yo'q) murojaatga javob yozilmaydi
+                    raise LookupError(f"murojaat #{murojaat_id} topilmadi")
+                await self._insert_javob(db, murojaat_id, admin_id, admin_username, javob_text)
+                return old_status
+            
+            old_status = await self._write(op)
+            self._status_changed(murojaat_id, old_status, status)
+            logger.info(f"✅ Javob saqlandi: #{murojaat_id} -> {status}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Javob saqlash xatolik: {e}")
+            return False
+    
+    async def get_daily_counts(self, since: str):
+        """Berilgan UTC vaqtdan beri har bir foydalanuvchi murojaatlari soni"""
+        try:
+            async with self.reader() as db:
+                # +user_id: guruhlash uchun butun user indeksini skan qilmasdan,
+                # created_at oralig'i bo'yicha faqat bugungi qatorlar o'qiladi
                 async with db.execute(
-                    "SELECT COUNT(*) FROM murojaatlar WHERE user_id = ? AND DATE(created_at) = ?",
-                    (user_id, today)
+                    "SELECT user_id, COUNT(*) FROM murojaatlar WHERE created_at >= ? GROUP BY +user_id",
+                    (since,)
                 ) as cursor:
-                    row = await cursor.fetchone()
-                    return row[0] if row else 0
+                    return {row[0]: row[1] for row in await cursor.fetchall()}
         except Exception as e:
             logger.error(f"❌ Daily count xatolik: {e}")
-            return 0
+            return {}
     
     async def get_pending_murojaatlar(self):
         """Javob kutayotgan murojaatlar"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
+            async with self.reader() as db:
                 async with db.execute(
                     "SELECT * FROM murojaatlar WHERE status = 'Yangi' ORDER BY created_at ASC"
                 ) as cursor:
@@ -312,63 +2075,568 @@ class Database:
             return []
     
     async def get_all_statistics(self):
-        """To'liq statistika"""
+        """To'liq statistika (kesh orqali)"""
+        cached = self._stats_cache
+        if (cached and cached['day'] == local_today()
+                and time.monotonic() < cached['expires']):
+            return self._copy_stats(cached['stats'])
+        
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                
-                # Umumiy soni
-                async with db.execute("SELECT COUNT(*) as total FROM murojaatlar") as cursor:
-                    total = (await cursor.fetchone())['total']
-                
-                # Javob berilgan
-                async with db.execute("SELECT COUNT(*) FROM murojaatlar WHERE status = 'Javob berildi'") as cursor:
-                    answered = (await cursor.fetchone())[0]
-                
-                # Javob kutayotgan
-                async with db.execute("SELECT COUNT(*) FROM murojaatlar WHERE status = 'Yangi'") as cursor:
-                    pending = (await cursor.fetchone())[0]
-                
-                # Bugungi
-                today = datetime.now().strftime('%Y-%m-%d')
-                async with db.execute(
-                    "SELECT COUNT(*) FROM murojaatlar WHERE DATE(created_at) = ?",
-                    (today,)
-                ) as cursor:
-                    today_count = (await cursor.fetchone())[0]
-                
-                # Haftalik
-                week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-                async with db.execute(
-                    "SELECT COUNT(*) FROM murojaatlar WHERE DATE(created_at) >= ?",
-                    (week_ago,)
-                ) as cursor:
-                    weekly = (await cursor.fetchone())[0]
-                
-                # Kategoriyalar bo'yicha
-                async with db.execute("""
-                    SELECT category, COUNT(*) as count 
-                    FROM murojaatlar 
-                    GROUP BY category 
-                    ORDER BY count DESC
-                """) as cursor:
-                    categories = [dict(row) for row in await cursor.fetchall()]
-                
-                return {
-                    'total': total,
-                    'answered': answered,
-                    'pending': pending,
-                    'today': today_count,
-                    'weekly': weekly,
-                    'categories': categories
+            version = self._stats_version
+            today_start = day_start_utc()
+            week_start = day_start_utc(days_ago=7)
+            
+            # Bitta o'tishda barcha ko'rsatkichlar, kategoriya bo'yicha
+            async with self.reader() as db:
+                async with db.execute(stats_sql(), (today_start, week_start)) as cursor:
+                    rows = await cursor.fetchall()
+            
+            stats = rows_to_stats(rows, await self._get_archive_stats(today_start, week_start))
+            # O'qish paytida yozuv bo'lgan bo'lsa, natija keshga qo'yilmaydi
+            if version == self._stats_version:
+                self._stats_cache = {
+                    'stats': stats,
+                    'day': local_today(),
+                    'expires': time.monotonic() + STATS_CACHE_TTL
                 }
+            return self._copy_stats(stats)
         except Exception as e:
             logger.error(f"❌ Statistika xatolik: {e}")
             return None
+    
+    async def _get_archive_stats(self, today_start: str, week_start: str) -> list:
+        """Arxiv statistikasi: arxiv faqat ``archive_answered`` da o'zgaradi, shuning
+        uchun u kuniga yoki ko'chirishdan keyin bir marta hisoblanadi"""
+        if not self.archive_ready:
+            return []
+        cached = self._archive_stats
+        if cached and cached[0] == (today_start, week_start):
+            return cached[1]
+        async with self.reader(archive=True) as db:
+            async with db.execute(stats_sql(schemas=("archive",)), (today_start, week_start)) as cursor:
+                rows = [dict(row) for row in await cursor.fetchall()]
+        self._archive_stats = ((today_start, week_start), rows)
+        return rows
+    
+    async def archive_answered(self, days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """Javob berilganiga ``days`` kundan oshgan murojaatlarni javoblari bilan arxivga ko'chirish
+
+        Har bir bo'lak ``batch_size`` ta murojaat, bo'laklar orasida boshqa
+        yozuvlar navbat kutmaydi. Qaytaradi: ko'chirilgan murojaatlar soni.
+        """
+        if not self.archive_ready or self._archive_lock.locked():
+            return 0
+        cutoff = day_start_utc(days)
+        moved = 0
+        async with self._archive_lock:
+            try:
+                async with self._archive_writer():
+                    while True:
+                        count = await self._archive_batch(cutoff, batch_size)
+                        moved += count
+                        if count < batch_size:
+                            break
+                    if moved:
+                        async with self._write_lock:
+                            await self._writer.execute("PRAGMA archive.wal_checkpoint(TRUNCATE)")
+            except Exception as e:
+                logger.error(f"❌ Arxivlash xatolik: {e}")
+        if moved:
+            logger.info(f"🗄 Arxivga ko'chirildi: {moved} ta murojaat")
+        return moved
+    
+    async def _archive_batch(self, cutoff: str, limit: int) -> int:
+        """Bitta bo'lak: avval arxivga nusxa (commit), keyin asosiy jadvaldan o'chirish (commit)
+
+        WAL rejimida bir nechta fayl bo'yicha tranzaksiya atomar emas: bitta
+        tranzaksiyada to'xtab qolish qatorlarni yo'qotishi mumkin edi. Shu
+        tartibda esa eng yomoni - ikkala faylda nusxa qoladi va keyingi
+        ishga tushishda arxivdagisi qayta yoziladi. Yozish qulfi ikkala
+        tranzaksiya davomida ushlanadi: orada yangi javob qo'shilib, keyin
+        o'chib ketmasligi uchun.
+        """
+        async with self._write_lock:
+            conn = self._writer
+            try:
+                async with conn.execute(
+                    """SELECT id FROM main.murojaatlar
+                       WHERE status = 'Javob berildi' AND admin_checked_at < ?
+                       ORDER BY admin_checked_at LIMIT ?""",
+                    (cutoff, limit)
+                ) as cursor:
+                    ids = [row[0] for row in await cursor.fetchall()]
+                if not ids:
+                    return 0
+                placeholders = ", ".join("?" for _ in ids)
+                
+                for table, key in (("murojaatlar", "id"), ("javoblar", "murojaat_id")):
+                    columns = self.column_names(table)
+                    # INSERT OR REPLACE FTS delete triggerini chaqirmaydi
+                    await conn.execute(f"DELETE FROM archive.{table} WHERE {key} IN ({placeholders})", ids)
+                    await conn.execute(
+                        f"INSERT INTO archive.{table} ({columns}) "
+                        f"SELECT {columns} FROM main.{table} WHERE {key} IN ({placeholders})",
+                        ids
+                    )
+                await conn.commit()
+                self.commits += 1
+                
+                await conn.execute(f"DELETE FROM main.javoblar WHERE murojaat_id IN ({placeholders})", ids)
+                await conn.execute(f"DELETE FROM main.murojaatlar WHERE id IN ({placeholders})", ids)
+                await conn.commit()
+                self.commits += 1
+            except BaseException:
+                await conn.rollback()
+                raise
+        
+        # Jami statistika o'zgarmaydi, lekin bu paytdagi o'qish keshga tushmasin
+        self._archive_stats = None
+        self._stats_version += 1
+        return len(ids)
+    
+    @staticmethod
+    def _copy_stats(stats: dict) -> dict:
+        return {**stats, 'categories': [dict(c) for c in stats['categories']]}
+    
+    def _stats_on_add(self, category: str):
+        """Keshdagi statistikani yangi murojaat bilan yangilash"""
+        self._stats_version += 1
+        cached = self._stats_cache
+        if not cached:
+            return
+        stats = cached['stats']
+        for key in ('total', 'pending', 'today', 'weekly'):
+            stats[key] += 1
+        for cat in stats['categories']:
+            if cat['category'] == category:
+                cat['count'] += 1
+                break
+        else:
+            stats['categories'].append({'category': category, 'count': 1})
+        stats['categories'].sort(key=lambda c: c['count'], reverse=True)
+    
+    def _stats_on_status(self, old_status: str, new_status: str):
+        """Keshdagi statistikani status o'zgarishi bilan yangilash"""
+        self._stats_version += 1
+        cached = self._stats_cache
+        if not cached or old_status == new_status:
+            return
+        stats = cached['stats']
+        counters = {'Javob berildi': 'answered', 'Yangi': 'pending'}
+        if old_status in counters:
+            stats[counters[old_status]] -= 1
+        if new_status in counters:
+            stats[counters[new_status]] += 1
 
 # Database instance
+instrument_methods(Database, DB_SECONDS)
 db = Database()
 
+# ==================== KUNLIK LIMIT ====================
+class DailyQuota:
+    """Xotiradagi kunlik limit hisobi
+
+    Startda database dan to'ldiriladi, so'ng limit tekshiruvi database ga
+    murojaat qilmaydi. ``try_reserve`` await qilmaydi, shuning uchun bir
+    foydalanuvchining parallel yuborishlarida ham atomar ishlaydi.
+    """
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._day = None
+        self._counts = {}
+    
+    def _rollover(self):
+        """Yangi kun boshlangan bo'lsa hisobni tozalash"""
+        today = local_today()
+        if self._day != today:
+            self._day = today
+            self._counts = {}
+    
+    async def warm(self, database: Database):
+        """Bugungi hisoblarni database dan yuklash"""
+        since = day_start_utc()
+        counts = await database.get_daily_counts(since)
+        self._day = local_today()
+        self._counts = counts
+        logger.info(f"✅ Kunlik limit yuklandi: {len(counts)} ta foydalanuvchi ({since} UTC dan)")
+    
+    def used(self, user_id: int) -> int:
+        """Bugun band qilingan joylar soni"""
+        self._rollover()
+        return self._counts.get(user_id, 0)
+    
+    def try_reserve(self, user_id: int) -> bool:
+        """Limit ichida bo'lsa bitta joyni band qilish"""
+        self._rollover()
+        count = self._counts.get(user_id, 0)
+        if count >= self.limit:
+            return False
+        self._counts[user_id] = count + 1
+        return True
+    
+    def release(self, user_id: int):
+        """Saqlanmagan murojaat uchun band qilingan joyni qaytarish"""
+        self._rollover()
+        count = self._counts.get(user_id, 0)
+        if count > 1:
+            self._counts[user_id] = count - 1
+        else:
+            self._counts.pop(user_id, None)
+
+quota = DailyQuota(DAILY_LIMIT)
+
+# ==================== MEDIA ====================
+def media_object_path(root: str, digest: str, ext: str = "jpg", variant: str = "orig") -> str:
+    """Hash bo'yicha rasm yo'li: root/<variant>/ab/cd/<hash>.<ext>"""
+    return os.path.join(root, variant, digest[:2], digest[2:4], f"{digest}.{ext}")
+
+def store_media_file(src: str, root: str, ext: str, variants: dict = MEDIA_VARIANTS):
+    """Vaqtinchalik faylni hash bo'yicha joylash va kichik nusxalarni yaratish
+
+    Ishchi pool da bajariladi (event loop ni bloklamaydi). Bir xil rasm
+    ikkinchi marta kelsa, yangi nusxa o'chiriladi.
+    Natija: (hash, hajm, [(path, kind, size), ...]).
+    """
+    sha = hashlib.sha256()
+    with open(src, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    size = os.path.getsize(src)
+    
+    target = media_object_path(root, digest, ext)
+    if os.path.exists(target):
+        os.remove(src)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(src, target)
+    files = [(target, "orig", size)]
+    
+    if Image is not None:
+        for variant, max_side in variants.items():
+            variant_path = media_object_path(root, digest, "jpg", variant)
+            if os.path.exists(variant_path):
+                files.append((variant_path, variant, os.path.getsize(variant_path)))
+                continue
+            os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+            with Image.open(target) as image:
+                image = ImageOps.exif_transpose(image).convert("RGB")
+                image.thumbnail((max_side, max_side))
+                tmp_path = f"{variant_path}.{secrets.token_hex(4)}.tmp"
+                image.save(tmp_path, "JPEG", quality=80, optimize=True)
+                os.replace(tmp_path, variant_path)
+            files.append((variant_path, variant, os.path.getsize(variant_path)))
+    return digest, size, files
+
+def remove_files(paths: list) -> int:
+    """Fayllarni o'chirish, bo'shagan baytlar soni"""
+    freed = 0
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
+
+class MediaStore:
+    """Guruhga rasm yuborish va rasmlarni arxivlash
+
+    Foydalanuvchi rasmi guruhga Telegram ``file_id`` orqali yuboriladi,
+    ya'ni fayl serverga qayta yuklanmaydi. Lokal nusxa (``MEDIA_ARCHIVE``)
+    murojaat saqlangandan keyin fonda yuklab olinadi va sha256 bo'yicha
+    ``MEDIA_PATH/<variant>/ab/cd/<hash>.<ext>`` ga joylanadi; murojaatda
+    faqat hash saqlanadi. Telegram ``file_unique_id`` si oldin kelgan rasm
+    qayta yuklanmaydi. Hash va kichik nusxalar (``MEDIA_VARIANTS``) ishchi
+    pool da hisoblanadi.
+
+    ``DEFAULT_IMAGE`` bir marta yuklanadi, uning ``file_id`` si
+    ``bot_settings`` jadvalida saqlanadi va keyingi murojaatlarda
+    (redeploy dan keyin ham) ishlatiladi.
+    """
+    
+    def __init__(self, bot: Bot, database: Database, directory: str = MEDIA_PATH,
+                 default_image: str = DEFAULT_IMAGE, archive: bool = MEDIA_ARCHIVE,
+                 workers: int = MEDIA_WORKERS):
+        self.bot = bot
+        self.database = database
+        self.directory = directory
+        self.default_image = default_image
+        self.archive_enabled = archive
+        self.workers = workers
+        self._executor = None
+        self._default_file_id = None
+        self._default_lock = asyncio.Lock()
+        self._tasks = set()
+    
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media")
+        return self._executor
+    
+    def path_for(self, digest: str, ext: str = "jpg", variant: str = "orig") -> str:
+        return media_object_path(self.directory, digest, ext, variant)
+    
+    def _default_key(self):
+        """file_id bot ga bog'liq, fayl o'zgarsa qayta yuklanadi"""
+        stat = os.stat(self.default_image)
+        return f"default_image:{self.bot.id}:{stat.st_size}:{int(stat.st_mtime)}"
+    
+    async def send_photo(self, chat_id: int, caption: str, file_id: str = None):
+        """Rasmni (yoki default rasmni) caption bilan yuborish"""
+        if file_id:
+            return await self.bot.send_photo(chat_id, photo=file_id, caption=caption, parse_mode="HTML")
+        if not os.path.exists(self.default_image):
+            return await self.bot.send_message(chat_id, caption, parse_mode="HTML")
+        
+        key = self._default_key()
+        cached = self._default_file_id
+        if cached is None or cached[0] != key:
+            value = await self.database.get_setting(key)
+            cached = self._default_file_id = (key, value)
+        
+        if cached[1]:
+            try:
+                return await self.bot.send_photo(chat_id, photo=cached[1], caption=caption, parse_mode="HTML")
+            except TelegramBadRequest as e:
+                logger.warning(f"⚠️ Default rasm file_id yaroqsiz, qayta yuklanadi: {e}")
+                self._default_file_id = (key, None)
+                await self.database.set_setting(key, None)
+        
+        async with self._default_lock:
+            # Parallel birinchi yuborishlarda faqat bittasi yuklaydi
+            if self._default_file_id and self._default_file_id[1]:
+                return await self.bot.send_photo(
+                    chat_id, photo=self._default_file_id[1], caption=caption, parse_mode="HTML"
+                )
+            sent_message = await self.bot.send_photo(
+                chat_id, photo=FSInputFile(self.default_image), caption=caption, parse_mode="HTML"
+            )
+            uploaded_id = sent_message.photo[-1].file_id
+            self._default_file_id = (key, uploaded_id)
+            await self.database.set_setting(key, uploaded_id)
+            logger.info("✅ Default rasm yuklandi, file_id saqlandi")
+            return sent_message
+    
+    def archive(self, murojaat_id: int, photo: PhotoSize):
+        """Rasmni fonda lokal papkaga yuklab olish"""
+        if not self.archive_enabled:
+            return
+        task = asyncio.create_task(self._download(murojaat_id, photo))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _download(self, murojaat_id: int, photo: PhotoSize):
+        try:
+            known = await self.database.get_media_by_unique_id(photo.file_unique_id)
+            # Original tozalangan bo'lsa qayta yuklab olinadi
+            if known and os.path.exists(self.path_for(*known)):
+                digest, ext = known
+                await self.database.attach_media(murojaat_id, digest, ext, photo.file_size or 0)
+                logger.info(f"✅ Rasm oldin saqlangan: {digest[:12]} (#{murojaat_id})")
+                return
+            
+            async with bulk_sends():
+                file = await self.bot.get_file(photo.file_id)
+            ext = file.file_path.rsplit('.', 1)[-1].lower() if '.' in file.file_path else "jpg"
+            tmp_dir = os.path.join(self.directory, "tmp")
+            os.makedirs(tmp_dir, exist_ok=True)
+            tmp_path = os.path.join(tmp_dir, f"{murojaat_id}_{secrets.token_hex(4)}.{ext}")
+            await self.bot.download_file(file.file_path, tmp_path)
+            
+            loop = asyncio.get_running_loop()
+            digest, size, files = await loop.run_in_executor(
+                self._get_executor(), store_media_file, tmp_path, self.directory, ext
+            )
+            await self.database.attach_media(murojaat_id, digest, ext, size, photo.file_unique_id, files)
+            logger.info(f"✅ Rasm arxivlandi: {digest[:12]} (#{murojaat_id})")
+        except Exception as e:
+            logger.error(f"❌ Rasmni arxivlash xatolik #{murojaat_id}: {e}")
+    
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+    
+    async def close(self):
+        """Tugallanmagan arxivlashlarni kutish"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+media_store = MediaStore(bot, db)
+
+class MediaCollector:
+    """MEDIA_PATH ni tozalash: saqlanish muddati va disk limiti
+
+    Diskdagi fayllar ``media_files`` jadvalida indekslanadi: MediaStore
+    yozgan har bir fayl u yerga darhol qo'shiladi, eski (tekis papkadagi)
+    fayllar esa bir marta, papkaning yuqori darajasidan ro'yxatga olinadi.
+    Shuning uchun har bir ishga tushishda ``os.walk`` qilinmaydi.
+
+    1. Javob berilganiga ``retention_days`` dan oshgan murojaatlarning
+       originallari o'chiriladi (web va thumb nusxalar qoladi).
+    2. Jami hajm ``quota_bytes`` dan oshsa, javob berilgan murojaatlarning
+       originallari, so'ng web nusxalari eng eskisidan o'chiriladi.
+    
+    Javob kutayotgan murojaat rasmlari, thumb nusxalar va
+    ``murojaatlar.image_path`` da ko'rsatilgan fayllar hech qachon
+    o'chirilmaydi. Arxivdagi murojaatlar ham hisobga olinadi.
+    """
+    
+    BATCH_SIZE = 500
+    LEGACY_INDEX_KEY = "media_gc:legacy_indexed"
+    LEGACY_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+    TMP_MAX_AGE = 3600
+    
+    # Fayl biror murojaatning image_path ida ko'rsatilmagan (har bir schema da)
+    NOT_BY_PATH = "NOT EXISTS (SELECT 1 FROM {schema}.murojaatlar p WHERE p.image_path = f.path)"
+    # Rasm javob kutayotgan murojaatga tegishli emas (arxivda javob kutayotganlar yo'q)
+    NOT_PENDING = """NOT EXISTS (SELECT 1 FROM main.murojaatlar m
+                                 WHERE m.image_hash = f.hash AND m.status = 'Yangi')"""
+    # Rasmli murojaatga javob cutoff dan keyin berilgan yoki hali berilmagan (har bir schema da)
+    NOT_RECENT = """NOT EXISTS (SELECT 1 FROM {schema}.murojaatlar m
+                                WHERE m.image_hash = f.hash
+                                  AND (m.admin_checked_at IS NULL OR m.admin_checked_at >= ?))"""
+    
+    def __init__(self, database: Database, store: MediaStore, directory: str = MEDIA_PATH,
+                 quota_bytes: int = MEDIA_QUOTA_MB * 1024 * 1024,
+                 retention_days: int = MEDIA_RETENTION_DAYS):
+        self.database = database
+        self.store = store
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.retention_days = retention_days
+        self._lock = asyncio.Lock()
+    
+    async def run(self):
+        """Bitta tozalash sikli (APScheduler dan chaqiriladi)"""
+        if self._lock.locked():
+            return
+        async with self._lock:
+            try:
+                await self._index_legacy()
+                await self._clean_tmp()
+                freed = await self._apply_retention()
+                total = await self._total_bytes()
+                if total > self.quota_bytes:
+                    freed += await self._enforce_quota(total)
+                if freed:
+                    logger.info(f"🗑 Media tozalandi: {freed / 1024 / 1024:.1f} MB")
+            except Exception as e:
+                logger.error(f"❌ Media tozalash xatolik: {e}")
+    
+    async def _index_legacy(self):
+        """Eski ``{user_id}_{vaqt}.{ext}`` fayllarni bir marta ro'yxatga olish"""
+        if await self.database.get_setting(self.LEGACY_INDEX_KEY):
+            return
+        
+        def scan():
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    # Faqat rasmlar: MEDIA_PATH da database fayli ham turishi mumkin
+                    if entry.is_file() and entry.name.lower().endswith(self.LEGACY_EXTENSIONS):
+                        st = entry.stat()
+                        created = datetime.utcfromtimestamp(st.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                        entries.append((os.path.join(self.directory, entry.name), st.st_size, created))
+            return entries
+        
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(self.store._get_executor(), scan)
+        async with self.database.writer() as conn:
+            await conn.executemany(
+                """INSERT OR IGNORE INTO media_files (path, hash, kind, size, created_at)
+                   VALUES (?, NULL, 'legacy', ?, ?)""",
+                entries
+            )
+        await self.database.set_setting(self.LEGACY_INDEX_KEY, str(len(entries)))
+        logger.info(f"✅ Eski media fayllar indekslandi: {len(entries)} ta")
+    
+    async def _clean_tmp(self):
+        """To'xtab qolgan yuklab olishlardan qolgan vaqtinchalik fayllar"""
+        tmp_dir = os.path.join(self.directory, "tmp")
+        if not os.path.isdir(tmp_dir):
+            return
+        cutoff = time.time() - self.TMP_MAX_AGE
+        stale = [entry.path for entry in os.scandir(tmp_dir)
+                 if entry.is_file() and entry.stat().st_mtime < cutoff]
+        if stale:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.store._get_executor(), remove_files, stale)
+    
+    async def _total_bytes(self) -> int:
+        async with self.database.reader() as conn:
+            async with conn.execute("SELECT COALESCE(SUM(size), 0) FROM media_files") as cursor:
+                return (await cursor.fetchone())[0]
+    
+    async def _delete(self, paths: list) -> int:
+        """Fayllarni diskdan va indeksdan o'chirish"""
+        if not paths:
+            return 0
+        loop = asyncio.get_running_loop()
+        freed = await loop.run_in_executor(self.store._get_executor(), remove_files, paths)
+        async with self.database.writer() as conn:
+            await conn.executemany("DELETE FROM media_files WHERE path = ?", [(p,) for p in paths])
+        return freed
+    
+    def _all_schemas(self, condition: str) -> str:
+        """``{schema}`` li shart asosiy va arxiv jadvallari uchun (AND)"""
+        return " AND ".join(condition.replace("{schema}", schema) for schema in self.database.schemas)
+    
+    async def _candidates(self, where: str, params: tuple = (), limit: int = BATCH_SIZE):
+        async with self.database.reader(archive=True) as conn:
+            async with conn.execute(
+                f"""SELECT f.path, f.size FROM media_files f
+                    WHERE {where} AND {self._all_schemas(self.NOT_BY_PATH)}
+                    ORDER BY f.created_at LIMIT ?""",
+                params + (limit,)
+            ) as cursor:
+                return [tuple(row) for row in await cursor.fetchall()]
+    
+    async def _apply_retention(self) -> int:
+        """Muddati o'tgan originallar va hech qayerda ishlatilmagan eski fayllar"""
+        cutoff = day_start_utc(self.retention_days)
+        # Original: hamma murojaatlari javob berilgan va oxirgi javob cutoff dan oldin
+        expired_orig = f"f.kind = 'orig' AND {self.NOT_PENDING} AND {self._all_schemas(self.NOT_RECENT)}"
+        orphan_legacy = "f.kind = 'legacy' AND f.created_at < ?"
+        freed = 0
+        for where, params in ((expired_orig, (cutoff,) * len(self.database.schemas)),
+                              (orphan_legacy, (cutoff,))):
+            while True:
+                rows = await self._candidates(where, params)
+                freed += await self._delete([path for path, _ in rows])
+                if len(rows) < self.BATCH_SIZE:
+                    break
+        return freed
+    
+    async def _enforce_quota(self, total: int) -> int:
+        """Disk limitiga tushguncha eng eski o'chirilishi mumkin fayllar"""
+        freed = 0
+        for kind in ("orig", "web"):
+            while total > self.quota_bytes:
+                rows = await self._candidates(f"f.kind = '{kind}' AND {self.NOT_PENDING}")
+                if not rows:
+                    break
+                batch = []
+                for path, size in rows:
+                    if total <= self.quota_bytes:
+                        break
+                    batch.append(path)
+                    total -= size
+                freed += await self._delete(batch)
+        if total > self.quota_bytes:
+            logger.warning(
+                f"⚠️ Media hajmi limitdan oshdi: {total / 1024 / 1024:.1f} MB "
+                f"(limit {self.quota_bytes / 1024 / 1024:.0f} MB), o'chiriladigan fayl qolmadi"
+            )
+        return freed
+
+media_collector = MediaCollector(db, media_store)
+
 # ==================== FSM STATES ====================
 class MurojaatStates(StatesGroup):
     """Murojaat yuborish holatlari"""
@@ -421,57 +2689,186 @@ def get_photo_keyboard():
 
 # ==================== REMINDER SCHEDULER ====================
 class ReminderScheduler:
-    """Eslatmalar rejasi"""
+    """Eslatmalar rejasi: muddatga asoslangan eskalatsiya
+
+    Javob kutayotgan har bir murojaat uchun keyingi bosqich muddati
+    navbatda (heap) saqlanadi. Navbat startda indekslangan so'rovdan
+    tiklanadi va ``add_murojaat`` / ``update_status`` hodisalari bilan
+    yangilanadi. Murojaat bosqich muddatini o'tishi bilan faqat uning
+    kategoriyasi guruhiga ID lari bilan xabar yuboriladi. Bosqich xabar
+    yuborilgandan keyingina ``escalation_level`` ustunida saqlanadi, shuning
+    uchun redeploy dan keyin eslatmalar takrorlanmaydi, yuborilmaganlari esa
+    kechikish bilan qayta urinib ko'riladi.
+    
+    ``scheduler`` (APScheduler) boshqa davriy vazifalar uchun.
+    """
+    
+    MAX_IDS_IN_MESSAGE = 50
+    # Yuborish xato bersa qayta urinish kechikishi (soniya), har safar ikki baravar
+    RETRY_DELAY = 60
+    RETRY_DELAY_MAX = 3600
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, database: Database = None, tiers: list = None):
         self.bot = bot
+        self.database = database or db
+        self.tiers = tiers or ESCALATION_TIERS
         self.scheduler = AsyncIOScheduler()
+        self._heap = []
+        self._pending = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._send_tasks = set()
     
-    def start(self):
-        """Schedulerni ishga tushirish"""
-        self.scheduler.add_job(
-            self.send_reminders,
-            'cron',
-            hour=10,
-            minute=0,
-            id='reminder_job'
-        )
+    @property
+    def tracked(self) -> int:
+        """Eskalatsiya kutayotgan murojaatlar soni"""
+        return len(self._pending)
+    
+    async def start(self):
+        """Navbatni tiklash va schedulerni ishga tushirish"""
+        await self.rebuild()
+        self.database.add_listener(self)
+        self._task = asyncio.create_task(self._run())
         self.scheduler.start()
-        logger.info("✅ Reminder scheduler ishga tushdi")
+        logger.info(f"✅ Reminder scheduler ishga tushdi: {len(self._pending)} ta murojaat kuzatilmoqda")
     
-    async def send_reminders(self):
-        """Eslatmalarni yuborish"""
-        try:
-            cutoff_date = (datetime.now() - timedelta(days=REMINDER_DAYS)).strftime('%Y-%m-%d')
-            
-            async with aiosqlite.connect(DB_PATH) as db_conn:
-                db_conn.row_factory = aiosqlite.Row
-                async with db_conn.execute(
-                    """SELECT * FROM murojaatlar 
-                       WHERE status = 'Yangi' 
-                       AND DATE(created_at) <= ?""",
-                    (cutoff_date,)
-                ) as cursor:
-                    old_requests = await cursor.fetchall()
-            
-            if old_requests:
-                message = (
-                    f"⚠️ <b>ESLATMA!</b>\n\n"
-                    f"Javob kutayotgan eski murojaatlar: <b>{len(old_requests)} ta</b>\n"
-                    f"({REMINDER_DAYS} kundan oshgan)\n\n"
-                    f"Iltimos, ko'rib chiqing!"
-                )
-
-                for group_id in get_all_group_ids():
-                    try:
-                        await self.bot.send_message(group_id, message, parse_mode="HTML")
-                    except Exception as group_error:
-                        logger.error(f"❌ Guruhga eslatma yuborish xatolik {group_id}: {group_error}")
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+    
+    async def rebuild(self):
+        """Javob kutayotgan murojaatlardan navbatni qayta qurish"""
+        self._heap = []
+        self._pending = {}
+        async with self.database.reader() as conn:
+            async with conn.execute(
+                """SELECT id, category, created_at, COALESCE(escalation_level, 0) AS level
+                   FROM murojaatlar WHERE status = 'Yangi'"""
+            ) as cursor:
+                async for row in cursor:
+                    created = datetime.strptime(row['created_at'][:19], '%Y-%m-%d %H:%M:%S')
+                    created_ts = created.replace(tzinfo=ZoneInfo("UTC")).timestamp()
+                    self._track(row['id'], row['category'], created_ts, row['level'])
+    
+    def _track(self, murojaat_id: int, category: str, created_ts: float, level: int):
+        """Murojaatning keyingi bosqich muddatini navbatga qo'yish
 
-                logger.info(f"📨 Eslatma yuborildi: {len(old_requests)} ta eski murojaat")
+        Bir nechta bosqich muddati allaqachon o'tgan bo'lsa (birinchi deploy,
+        uzoq to'xtash), faqat eng yuqorisi yuboriladi: oraliq bosqichlar
+        o'tkazib yuboriladi.
+        """
+        now = time.time()
+        while level + 1 < len(self.tiers) and created_ts + self.tiers[level + 1] * 86400 <= now:
+            level += 1
+        if level >= len(self.tiers):
+            self._pending.pop(murojaat_id, None)
+            return
+        self._pending[murojaat_id] = {'category': category, 'created': created_ts, 'level': level}
+        self._push(created_ts + self.tiers[level] * 86400, murojaat_id, level)
+    
+    def _push(self, due: float, murojaat_id: int, level: int):
+        if not self._heap or due < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (due, murojaat_id, level))
+    
+    def on_murojaat_added(self, murojaat_id: int, category: str, created_ts: float):
+        self._track(murojaat_id, category, created_ts, 0)
+    
+    def on_status_changed(self, murojaat_id: int, old_status: str, new_status: str):
+        # Navbatdagi eski yozuvlar chiqarilganda tashlab yuboriladi
+        if new_status != 'Yangi':
+            self._pending.pop(murojaat_id, None)
+    
+    async def _run(self):
+        """Eng yaqin muddatgacha kutish va muddati o'tganlarni yuborish"""
+        while True:
+            now = time.time()
+            if self._heap and self._heap[0][0] <= now:
+                try:
+                    await self._escalate(now)
+                except Exception as e:
+                    logger.error(f"❌ Reminder xatolik: {e}")
+                continue
+            
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _escalate(self, now: float):
+        """Muddati o'tgan murojaatlarni guruh va bosqich bo'yicha yig'ib yuborish"""
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, murojaat_id, level = heapq.heappop(self._heap)
+            info = self._pending.get(murojaat_id)
+            if not info or info['level'] != level:
+                continue
+            group_id = get_target_group(info['category'])
+            due.setdefault((group_id, level), []).append(murojaat_id)
+        
+        for (group_id, level), ids in due.items():
+            task = asyncio.create_task(self._deliver(group_id, level, sorted(ids)))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+    
+    async def _deliver(self, group_id: int, level: int, ids: list):
+        """Eslatmani yuborish; muvaffaqiyatli bo'lsa bosqichni saqlash, aks holda qayta navbatga qo'yish"""
+        sent = await self.send_reminder(group_id, level, ids)
+        # Yuborish davomida javob berilganlar navbatdan chiqib ketgan
+        ids = [i for i in ids if self._pending.get(i, {}).get('level') == level]
+        if not sent:
+            for murojaat_id in ids:
+                info = self._pending[murojaat_id]
+                retries = info.get('retries', 0)
+                info['retries'] = retries + 1
+                delay = min(self.RETRY_DELAY * 2 ** retries, self.RETRY_DELAY_MAX)
+                self._push(time.time() + delay, murojaat_id, level)
+            return
         
+        try:
+            async with self.database.writer() as conn:
+                await conn.executemany(
+                    "UPDATE murojaatlar SET escalation_level = ? WHERE id = ?",
+                    [(level + 1, murojaat_id) for murojaat_id in ids]
+                )
         except Exception as e:
-            logger.error(f"❌ Reminder xatolik: {e}")
+            logger.error(f"❌ Eskalatsiya bosqichini saqlash xatolik: {e}")
+        for murojaat_id in ids:
+            info = self._pending[murojaat_id]
+            self._track(murojaat_id, info['category'], info['created'], level + 1)
+    
+    async def send_reminder(self, group_id: int, level: int, ids: list) -> bool:
+        """Guruhga o'z murojaatlari haqida eslatma yuborish (yuborildimi)"""
+        days = self.tiers[level]
+        shown = ", ".join(f"#{i}" for i in ids[:self.MAX_IDS_IN_MESSAGE])
+        if len(ids) > self.MAX_IDS_IN_MESSAGE:
+            shown += f" ... va yana {len(ids) - self.MAX_IDS_IN_MESSAGE} ta"
+        tier_text = f"🔺 Bosqich: {level + 1}/{len(self.tiers)}\n" if len(self.tiers) > 1 else ""
+        message = (
+            f"⚠️ <b>ESLATMA!</b>\n\n"
+            f"Javob kutayotgan eski murojaatlar: <b>{len(ids)} ta</b>\n"
+            f"({days:g} kundan oshgan)\n"
+            f"{tier_text}\n"
+            f"📋 {shown}\n\n"
+            f"Iltimos, ko'rib chiqing!"
+        )
+        try:
+            async with bulk_sends():
+                await self.bot.send_message(group_id, message, parse_mode="HTML")
+            logger.info(f"📨 Eslatma yuborildi: guruh={group_id}, {len(ids)} ta murojaat, bosqich={level + 1}")
+            return True
+        except Exception as group_error:
+            logger.error(f"❌ Guruhga eslatma yuborish xatolik {group_id}: {group_error}")
+            return False
 
 # ==================== BOT HANDLERS ====================
 @dp.message(CommandStart())
@@ -484,20 +2881,23 @@ async def cmd_start(message: Message):
     
     await message.answer(welcome_text, reply_markup=get_main_menu(), parse_mode="HTML")
 
+def get_limit_text(daily_count: int) -> str:
+    """Kunlik limit tugagani haqida xabar"""
+    return (
+        f"⚠️ <b>Kunlik limit tugadi!</b>\n\n"
+        f"Siz bugun allaqachon {daily_count} ta murojaat yuborgansiz.\n"
+        f"Maksimal ruxsat: {DAILY_LIMIT} ta murojaat 1 kunda\n\n"
+        f"Iltimos, ertaga qayta urinib ko'ring."
+    )
+
 @dp.message(F.text == "📝 Murojaat yuborish")
 async def start_murojaat(message: Message, state: FSMContext):
     """Murojaat yuborishni boshlash"""
-    # Kunlik limitni tekshirish
-    daily_count = await db.get_daily_count(message.from_user.id)
-    
-    if daily_count >= DAILY_LIMIT:
-        await message.answer(
-            f"⚠️ <b>Kunlik limit tugadi!</b>\n\n"
-            f"Siz bugun allaqachon {daily_count} ta murojaat yuborgansiz.\n"
-            f"Maksimal ruxsat: {DAILY_LIMIT} ta murojaat 1 kunda\n\n"
-            f"Iltimos, ertaga qayta urinib ko'ring.",
-            parse_mode="HTML"
-        )
+    # Kunlik limitni tekshirish (xotiradan, database siz)
+    daily_count = quota.used(message.from_user.id)
+    
+    if daily_count >= DAILY_LIMIT:
+        await message.answer(get_limit_text(daily_count), parse_mode="HTML")
         return
     
     await message.answer(
@@ -654,26 +3054,16 @@ async def skip_photo_callback(callback: CallbackQuery, state: FSMContext):
     await finish_murojaat(
         callback.message, 
         state, 
-        photo_path=None,
+        photo=None,
         user_id=callback.from_user.id
     )
 
 @dp.message(MurojaatStates.photo, F.photo)
 async def process_photo(message: Message, state: FSMContext):
     """Rasmni qabul qilish"""
-    photo = message.photo[-1]
-    
-    file = await bot.get_file(photo.file_id)
-    file_extension = file.file_path.split('.')[-1]
-    filename = f"{message.from_user.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_extension}"
-    photo_path = os.path.join(MEDIA_PATH, filename)
-    
-    await bot.download_file(file.file_path, photo_path)
-    logger.info(f"✅ Rasm saqlandi: {photo_path}")
-    
-    await finish_murojaat(message, state, photo_path=photo_path)
+    await finish_murojaat(message, state, photo=message.photo[-1])
 
-async def finish_murojaat(message: Message, state: FSMContext, photo_path: str = None, user_id: int = None):
+async def finish_murojaat(message: Message, state: FSMContext, photo: PhotoSize = None, user_id: int = None):
     """Murojaatni yakunlash"""
     data = await state.get_data()
     
@@ -686,6 +3076,18 @@ async def finish_murojaat(message: Message, state: FSMContext, photo_path: str =
         await state.clear()
         return
     
+    actual_user_id = user_id if user_id else message.from_user.id
+    
+    # Kunlik limit: yakuniy yuborishda joyni atomar band qilish
+    if not quota.try_reserve(actual_user_id):
+        await message.answer(
+            get_limit_text(quota.used(actual_user_id)),
+            reply_markup=get_main_menu(),
+            parse_mode="HTML"
+        )
+        await state.clear()
+        return
+    
     confirm_text = (
         "✅ <b>MUROJAAT TAYYORLANDI</b>\n\n"
         f"👤 <b>F.I.Sh:</b> {data['full_name']}\n"
@@ -694,7 +3096,7 @@ async def finish_murojaat(message: Message, state: FSMContext, photo_path: str =
         f"🏠 <b>Manzil:</b> {data['address']}\n"
         f"📂 <b>Tur:</b> {data['category']}\n"
         f"📝 <b>Matn:</b> {data['text']}\n"
-        f"📸 <b>Rasm:</b> {'✅ Bor' if photo_path else '❌ Yoq'}\n\n"
+        f"📸 <b>Rasm:</b> {'✅ Bor' if photo else '❌ Yoq'}\n\n"
         "<i>Murojaat guruhga yuborilmoqda...</i>"
     )
     
@@ -716,38 +3118,18 @@ async def finish_murojaat(message: Message, state: FSMContext, photo_path: str =
             "<i>💬 Javob berish uchun bu xabarga reply qiling!</i>"
         )
 
-        if photo_path and os.path.exists(photo_path):
-            photo_file = FSInputFile(photo_path)
-            sent_message = await bot.send_photo(
-                target_group_id,
-                photo=photo_file,
-                caption=group_text,
-                parse_mode="HTML"
-            )
-            final_image_path = photo_path
+        photo_file_id = photo.file_id if photo else None
+        sent_message = await media_store.send_photo(target_group_id, group_text, file_id=photo_file_id)
+        if photo:
+            final_image_path = None  # lokal nusxa fonda arxivlanadi (image_hash)
+        elif sent_message.photo:
+            final_image_path = DEFAULT_IMAGE
         else:
-            if os.path.exists(DEFAULT_IMAGE):
-                default_photo = FSInputFile(DEFAULT_IMAGE)
-                sent_message = await bot.send_photo(
-                    target_group_id,
-                    photo=default_photo,
-                    caption=group_text,
-                    parse_mode="HTML"
-                )
-                final_image_path = DEFAULT_IMAGE
-            else:
-                sent_message = await bot.send_message(
-                    target_group_id,
-                    group_text,
-                    parse_mode="HTML"
-                )
-                final_image_path = None
+            final_image_path = None
         
         group_message_id = sent_message.message_id
         logger.info(f"✅ Guruhga yuborildi: message_id={group_message_id}")
         
-        actual_user_id = user_id if user_id else message.from_user.id
-        
         murojaat_id = await db.add_murojaat(
             user_id=actual_user_id,
             full_name=data['full_name'],
@@ -757,10 +3139,14 @@ async def finish_murojaat(message: Message, state: FSMContext, photo_path: str =
             category=data['category'],
             text=data['text'],
             image_path=final_image_path,
-            group_message_id=group_message_id
+            group_message_id=group_message_id,
+            image_file_id=photo_file_id
         )
         
         if murojaat_id:
+            if photo:
+                media_store.archive(murojaat_id, photo)
+            reply_cache.put((target_group_id, group_message_id), (murojaat_id, actual_user_id))
             success_text = (
                 "✅ <b>MUROJAAT YUBORILDI!</b>\n\n"
                 f"📋 Murojaat raqami: <b>#{murojaat_id}</b>\n\n"
@@ -777,6 +3163,7 @@ async def finish_murojaat(message: Message, state: FSMContext, photo_path: str =
         
     except Exception as e:
         logger.error(f"❌ Guruhga yuborish xatolik: {e}")
+        quota.release(actual_user_id)
         import traceback
         traceback.print_exc()
         await message.answer(
@@ -803,20 +3190,28 @@ async def group_reply_handler(message: Message):
         reply_to_message_id = message.reply_to_message.message_id
         logger.info(f"🔍 Guruhda javob: reply_to={reply_to_message_id}")
         
-        murojaat = await db.get_murojaat_by_group_msg(reply_to_message_id)
+        cache_key = (message.chat.id, reply_to_message_id)
+        cached = reply_cache.get(cache_key)
         
-        if not murojaat:
-            logger.warning(f"⚠️ Murojaat topilmadi: {reply_to_message_id}")
-            await message.reply(
-                "❌ <b>Murojaat topilmadi!</b>\n\n"
-                f"Reply ID: <code>{reply_to_message_id}</code>\n\n"
-                "Murojaat xabariga to'g'ridan-to'g'ri reply qiling.",
-                parse_mode="HTML"
-            )
-            return
+        if cached:
+            murojaat_id, user_id = cached
+        else:
+            murojaat = await db.get_murojaat_by_group_msg(reply_to_message_id)
+            
+            if not murojaat:
+                logger.warning(f"⚠️ Murojaat topilmadi: {reply_to_message_id}")
+                await message.reply(
+                    "❌ <b>Murojaat topilmadi!</b>\n\n"
+                    f"Reply ID: <code>{reply_to_message_id}</code>\n\n"
+                    "Murojaat xabariga to'g'ridan-to'g'ri reply qiling.",
+                    parse_mode="HTML"
+                )
+                return
+            
+            murojaat_id = murojaat['id']
+            user_id = murojaat['user_id']
+            reply_cache.put(cache_key, (murojaat_id, user_id))
         
-        murojaat_id = murojaat['id']
-        user_id = murojaat['user_id']
         javob_text = message.text
         
         logger.info(f"✅ Murojaat topildi: #{murojaat_id}, user={user_id}")
@@ -828,8 +3223,13 @@ async def group_reply_handler(message: Message):
         admin_id = message.from_user.id
         admin_username = message.from_user.username or message.from_user.first_name or f"Admin{admin_id}"
         
-        await db.add_javob(murojaat_id, admin_id, admin_username, javob_text)
-        await db.update_status(murojaat_id, "Javob berildi")
+        if not await db.add_javob_with_status(murojaat_id, admin_id, admin_username, javob_text):
+            await message.reply(
+                f"❌ <b>Javob saqlanmadi!</b>\n\n"
+                f"📋 Murojaat #{murojaat_id} arxivga ko'chirilgan yoki topilmadi.",
+                parse_mode="HTML"
+            )
+            return
         
         await message.reply(
             f"✅ <b>JAVOB YUBORILDI!</b>\n\n"
@@ -841,9 +3241,8 @@ async def group_reply_handler(message: Message):
         )
         
         try:
-            bot_info = await bot.get_me()
-            
-            if user_id == bot_info.id:
+            # bot.id tokendan olinadi, API so'rovisiz
+            if user_id == bot.id:
                 logger.error(f"❌ User ID bot IDsi!")
                 await message.reply(
                     f"❌ <b>DATABASE XATOLIGI!</b>\n\n"
@@ -890,12 +3289,81 @@ async def group_reply_handler(message: Message):
         traceback.print_exc()
 
 # ==================== MUROJAATLARIM ====================
+def text_length(text: str) -> int:
+    """Telegram hisoblaganidek UTF-16 birliklardagi uzunlik"""
+    return len(text.encode('utf-16-le')) // 2
+
+def render_murojaatlar_page(rows: list, total: int):
+    """Sahifa matnini Telegram limitidan oshirmay yig'ish
+
+    Qaytaradi: (matn, ko'rsatilgan qatorlar).
+    """
+    response = f"📋 <b>MUROJAATLARIM</b>\n\n"
+    response += f"Jami: {total} ta\n\n"
+    # Tugmalar va HTML teglar uchun zaxira
+    budget = TELEGRAM_TEXT_LIMIT - 100
+    shown = []
+    
+    for m in rows:
+        status_emoji = "✅" if m['status'] == "Javob berildi" else "⏳"
+        
+        entry = (
+            f"{status_emoji} <b>#{m['id']}</b> - {html.escape((m['category'] or '')[:50])}\n"
+            f"📅 {m['created_at'][:16]}\n"
+            f"📊 Status: {m['status']}\n"
+        )
+        
+        if m['javob_count']:
+            entry += f"💬 Javoblar: {m['javob_count']} ta\n"
+            entry += f"   └ {html.escape((m['last_javob'] or '')[:50])}...\n"
+        
+        entry += "\n"
+        
+        if shown and text_length(response + entry) > budget:
+            break
+        response += entry
+        shown.append(m)
+    
+    return response, shown
+
+def get_murojaatlar_page_keyboard(first_id: int, last_id: int, has_prev: bool, has_next: bool):
+    """Oldingi/keyingi sahifa tugmalari"""
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"my:p:{first_id}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"my:n:{last_id}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+async def build_murojaatlar_page(user_id: int, cursor_id: int = None, newer: bool = False):
+    """Murojaatlar sahifasi: (matn, klaviatura) yoki bo'sh bo'lsa (None, None)"""
+    rows, has_more, total = await db.get_user_murojaatlar_page(
+        user_id, MY_PAGE_SIZE, cursor_id=cursor_id, newer=newer
+    )
+    if not rows:
+        return None, None
+    
+    response, shown = render_murojaatlar_page(rows, total)
+    
+    if newer:
+        has_prev = has_more
+        has_next = True
+    else:
+        has_prev = cursor_id is not None
+        has_next = has_more
+    # Limit tufayli qisqartirilgan bo'lsa, qolganlari keyingi sahifada
+    if len(shown) < len(rows):
+        has_next = True
+    
+    keyboard = get_murojaatlar_page_keyboard(shown[0]['id'], shown[-1]['id'], has_prev, has_next)
+    return response, keyboard
+
 @dp.message(F.text == "📋 Mening murojaatlarim")
 async def my_murojaatlar(message: Message):
     """Foydalanuvchi murojaatlari"""
-    murojaatlar = await db.get_user_murojaatlar(message.from_user.id)
+    response, keyboard = await build_murojaatlar_page(message.from_user.id)
     
-    if not murojaatlar:
+    if not response:
         await message.answer(
             "📭 <b>Sizda hali murojaatlar yo'q</b>\n\n"
             "Murojaat yuborish uchun \"📝 Murojaat yuborish\" tugmasini bosing.",
@@ -903,30 +3371,28 @@ async def my_murojaatlar(message: Message):
         )
         return
     
-    response = f"📋 <b>MUROJAATLARIM</b>\n\n"
-    response += f"Jami: {len(murojaatlar)} ta\n\n"
+    await message.answer(response, reply_markup=keyboard, parse_mode="HTML")
+
+@dp.callback_query(F.data.startswith("my:"))
+async def my_murojaatlar_page_callback(callback: CallbackQuery):
+    """Murojaatlar sahifasini almashtirish"""
+    try:
+        _, direction, cursor_id = callback.data.split(":")
+        cursor_id = int(cursor_id)
+    except ValueError:
+        await callback.answer()
+        return
     
-    for m in murojaatlar[:10]:
-        javoblar = await db.get_murojaat_javoblar(m['id'])
-        status_emoji = "✅" if m['status'] == "Javob berildi" else "⏳"
-        
-        response += (
-            f"{status_emoji} <b>#{m['id']}</b> - {m['category']}\n"
-            f"📅 {m['created_at'][:16]}\n"
-            f"📊 Status: {m['status']}\n"
-        )
-        
-        if javoblar:
-            response += f"💬 Javoblar: {len(javoblar)} ta\n"
-            for j in javoblar[:1]:
-                response += f"   └ {j['javob_text'][:50]}...\n"
-        
-        response += "\n"
+    response, keyboard = await build_murojaatlar_page(
+        callback.from_user.id, cursor_id=cursor_id, newer=(direction == "p")
+    )
     
-    if len(murojaatlar) > 10:
-        response += f"<i>... va yana {len(murojaatlar) - 10} ta</i>\n"
+    if not response:
+        await callback.answer("📭 Boshqa murojaatlar yo'q")
+        return
     
-    await message.answer(response, parse_mode="HTML")
+    await callback.message.edit_text(response, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
 
 # ==================== MA'LUMOT VA ALOQA ====================
 @dp.message(F.text == "ℹ️ Ma'lumot")
@@ -937,7 +3403,7 @@ async def info_handler(message: Message):
         "Bu bot orqali siz turli masalalar bo'yicha murojaat yuborishingiz mumkin.\n\n"
         f"📊 <b>Limitlar:</b>\n"
         f"• Kunlik: {DAILY_LIMIT} ta murojaat\n"
-        f"• Eslatma: {REMINDER_DAYS} kun\n\n"
+        f"• Eslatma: {ESCALATION_TIERS[0]:g} kun\n\n"
         "📂 <b>Kategoriyalar:</b>\n"
         "• Yo'l va transport\n"
         "• Kommunal xizmatlar\n"
@@ -962,100 +3428,397 @@ async def contact_handler(message: Message):
     await message.answer(contact_text, parse_mode="HTML")
 
 # ==================== EXCEL EXPORT ====================
-async def create_excel_report():
-    """Excel hisobot yaratish"""
-    try:
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Statistika"
-        
-        # Statistika
-        stats = await db.get_all_statistics()
+def get_report_styles():
+    """Hisobot uchun umumiy nomli stillar (har bir katak uchun yangi obyekt yaratilmaydi)"""
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    alignment = Alignment(horizontal='left', vertical='center')
+    
+    cell = NamedStyle(name="report_cell", border=border, alignment=alignment)
+    title = NamedStyle(name="report_title", font=Font(bold=True, size=14),
+                       border=border, alignment=alignment)
+    section = NamedStyle(name="report_section", font=Font(bold=True, size=12),
+                         border=border, alignment=alignment)
+    return [cell, title, section]
+
+def styled_row(ws, values, style: str = "report_cell"):
+    """Write-only varaq uchun stillangan qator"""
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        row.append(cell)
+    return row
+
+def trend_bar_chart(ws, title: str, first_row: int, last_row: int) -> BarChart:
+    """Kunlik jadval (A: sana, B: jami, C: javob berilgan) qatorlari bo'yicha ustunli diagramma"""
+    chart = BarChart()
+    chart.title = title
+    chart.overlap = 100
+    chart.gapWidth = 30
+    chart.width = 24
+    chart.height = 7.5
+    chart.add_data(Reference(ws, min_col=2, max_col=3, min_row=first_row, max_row=last_row))
+    chart.set_categories(Reference(ws, min_col=1, min_row=first_row, max_row=last_row))
+    for series, label in zip(chart.series, ("Jami", "Javob berilgan")):
+        series.tx = SeriesLabel(v=label)
+    return chart
+
+def category_pie_chart(ws, title: str, first_row: int, last_row: int) -> PieChart:
+    """Kategoriyalar (A: nomi, B: soni) bo'yicha doiraviy diagramma"""
+    chart = PieChart()
+    chart.title = title
+    chart.add_data(Reference(ws, min_col=2, min_row=first_row, max_row=last_row))
+    chart.set_categories(Reference(ws, min_col=1, min_row=first_row, max_row=last_row))
+    chart.dataLabels = DataLabelList()
+    chart.dataLabels.showPercent = True
+    return chart
+
+EXPORT_HEADERS = ['ID', 'Sana', 'F.I.Sh', 'Telefon', 'Kategoriya', 'Status', 'Javoblar']
+EXPORT_STATUSES = ["Yangi", "Javob berildi"]
+
+def export_filter_sql(filters: dict, alias: str = ""):
+    """Export filtrlari uchun WHERE shartlari va parametrlar
+
+    filters: date_from / date_to (UTC, [from, to) oraliq), categories, status.
+    """
+    prefix = f"{alias}." if alias else ""
+    clauses = []
+    params = []
+    if filters.get('date_from'):
+        clauses.append(f"{prefix}created_at >= ?")
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        clauses.append(f"{prefix}created_at < ?")
+        params.append(filters['date_to'])
+    if filters.get('categories'):
+        placeholders = ", ".join("?" for _ in filters['categories'])
+        clauses.append(f"{prefix}category IN ({placeholders})")
+        params.extend(filters['categories'])
+    if filters.get('status'):
+        clauses.append(f"{prefix}status = ?")
+        params.append(filters['status'])
+    return clauses, params
+
+def iter_export_rows(conn, chunk_size: int, filters: dict = None, schemas=("main",)):
+    """Export uchun murojaatlarni javoblar soni bilan bo'laklab o'qish
+
+    Har bir bo'lak alohida qisqa so'rov (keyset: created_at, id), shuning
+    uchun o'qish butun export davomida yozishni bloklamaydi. Filtrlar
+    indekslangan SQL shartlariga aylantiriladi. Arxiv ulangan bo'lsa,
+    ikkala jadval created_at tartibida birlashtiriladi.
+    """
+    base_clauses, base_params = export_filter_sql(filters or {}, alias="m")
+    last_key = None
+    while True:
+        clauses = list(base_clauses)
+        params = list(base_params)
+        if last_key is not None:
+            clauses.append("(m.created_at, m.id) < (?, ?)")
+            params.extend(last_key)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
         
-        ws['A1'] = "MUROJAATLAR STATISTIKASI"
-        ws['A1'].font = Font(bold=True, size=14)
+        rows = conn.execute(union_sql(f"""
+            SELECT m.id, m.created_at, m.full_name, m.phone, m.category, m.status,
+                   (SELECT COUNT(*) FROM {{schema}}.javoblar j
+                     WHERE j.murojaat_id = m.id) AS javob_count
+            FROM {{schema}}.murojaatlar m
+            {where}
+        """, schemas) + """
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, params * len(schemas) + [chunk_size]).fetchall()
         
-        ws['A3'] = "Ko'rsatkich"
-        ws['B3'] = "Qiymat"
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_key = (rows[-1]['created_at'], rows[-1]['id'])
+
+def export_row_values(m) -> list:
+    return [
+        m['id'],
+        m['created_at'][:16],
+        m['full_name'],
+        m['phone'],
+        m['category'],
+        m['status'],
+        m['javob_count']
+    ]
+
+def open_export_connection(db_path: str, archive_path: str = ARCHIVE_DB_PATH):
+    """Export ishchisi uchun faqat o'qish ulanishi (arxiv fayli bo'lsa, ATTACH qilinadi)"""
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, **connection_factory())
+    conn.row_factory = sqlite3.Row
+    for pragma in connection_pragmas(readonly=True):
+        conn.execute(pragma)
+    if archive_path and os.path.exists(archive_path):
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (f"{Path(archive_path).resolve().as_uri()}?mode=ro",))
+            conn.execute("SELECT 1 FROM archive.murojaatlar LIMIT 1").fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"❌ Arxivni export ga ulash xatolik: {e}")
+            if connection_schemas(conn) != ("main",):
+                conn.execute("DETACH DATABASE archive")
+    return conn
+
+def connection_schemas(conn) -> tuple:
+    """Ulanishdagi murojaatlar schema lari: main va (ulangan bo'lsa) archive"""
+    names = {row[1] for row in conn.execute("PRAGMA database_list")}
+    return ("main", "archive") if "archive" in names else ("main",)
+
+def build_excel_report(db_path: str, filepath: str, stats: dict, chunk_size: int,
+                       filters: dict = None) -> int:
+    """Excel faylni sinxron yaratish (thread yoki process ichida ishlaydi)
+
+    Write-only rejimda: qatorlar database dan bo'laklab o'qiladi va darhol
+    faylga yoziladi, shuning uchun xotira qatorlar soniga bog'liq emas.
+    Filtr berilgan bo'lsa, statistika ham shu filtr bo'yicha hisoblanadi.
+    Fayl avval vaqtinchalik nom bilan yoziladi. Qaytaradi: qatorlar soni.
+    """
+    conn = open_export_connection(db_path)
+    try:
+        schemas = connection_schemas(conn)
+        if filters:
+            clauses, params = export_filter_sql(filters)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            rows = conn.execute(
+                stats_sql(where, schemas), [day_start_utc(), day_start_utc(days_ago=7)] + params * len(schemas)
+            ).fetchall()
+            stats = rows_to_stats(rows)
         
-        ws['A4'] = "Jami murojaatlar"
-        ws['B4'] = stats['total']
+        wb = openpyxl.Workbook(write_only=True)
+        for style in get_report_styles():
+            wb.add_named_style(style)
         
-        ws['A5'] = "Javob berilgan"
-        ws['B5'] = stats['answered']
+        ws = wb.create_sheet("Statistika")
         
-        ws['A6'] = "Javob kutayotgan"
-        ws['B6'] = stats['pending']
+        ws.append(styled_row(ws, ["MUROJAATLAR STATISTIKASI"], "report_title"))
+        ws.append([])
+        ws.append(styled_row(ws, ["Ko'rsatkich", "Qiymat"]))
+        ws.append(styled_row(ws, ["Jami murojaatlar", stats['total']]))
+        ws.append(styled_row(ws, ["Javob berilgan", stats['answered']]))
+        ws.append(styled_row(ws, ["Javob kutayotgan", stats['pending']]))
+        ws.append(styled_row(ws, ["Bugun", stats['today']]))
+        ws.append(styled_row(ws, ["Oxirgi 7 kun", stats['weekly']]))
+        ws.append([])
         
-        ws['A7'] = "Bugun"
-        ws['B7'] = stats['today']
+        # Kategoriyalar
+        ws.append(styled_row(ws, ["KATEGORIYALAR"], "report_section"))
+        for cat in stats['categories']:
+            ws.append(styled_row(ws, [cat['category'], cat['count']]))
+        row = 10 + len(stats['categories'])
         
-        ws['A8'] = "Oxirgi 7 kun"
-        ws['B8'] = stats['weekly']
+        # Trendlar: kunlik yig'indilardan, murojaatlar jadvali skan qilinmaydi
+        period = max(TREND_DAYS)
+        trend_rows = conn.execute(trend_sql(filters), trend_params(period, filters)).fetchall()
+        trend = rows_to_trend(trend_rows, period)
         
-        # Kategoriyalar
-        ws['A10'] = "KATEGORIYALAR"
-        ws['A10'].font = Font(bold=True, size=12)
+        ws.append([])
+        ws.append(styled_row(ws, [f"KATEGORIYALAR (oxirgi {period} kun)"], "report_section"))
+        for cat in trend['categories']:
+            ws.append(styled_row(ws, [cat['category'], cat['count']]))
+        if trend['categories']:
+            ws.add_chart(category_pie_chart(
+                ws, f"Kategoriyalar ({period} kun)", row + 3, row + 2 + len(trend['categories'])
+            ), "E3")
+        row += 2 + len(trend['categories'])
         
-        row = 11
-        for cat in stats['categories']:
-            ws[f'A{row}'] = cat['category']
-            ws[f'B{row}'] = cat['count']
-            row += 1
+        ws.append([])
+        ws.append(styled_row(ws, ["KUNLIK DINAMIKA"], "report_section"))
+        ws.append(styled_row(ws, ["Sana", "Jami", "Javob berilgan"]))
+        for day, total, answered in trend['days']:
+            ws.append(styled_row(ws, [day, total, answered]))
+        last_day_row = row + 3 + len(trend['days'])
+        for anchor, days in zip(("E20", "E36"), TREND_DAYS):
+            ws.add_chart(trend_bar_chart(
+                ws, f"Oxirgi {days} kun", last_day_row - days + 1, last_day_row
+            ), anchor)
         
         # Murojaatlar
         ws2 = wb.create_sheet("Murojaatlar")
-        headers = ['ID', 'Sana', 'F.I.Sh', 'Telefon', 'Kategoriya', 'Status', 'Javoblar']
-        ws2.append(headers)
-        
-        async with aiosqlite.connect(DB_PATH) as db_conn:
-            db_conn.row_factory = aiosqlite.Row
-            async with db_conn.execute(
-                "SELECT * FROM murojaatlar ORDER BY created_at DESC"
-            ) as cursor:
-                murojaatlar = await cursor.fetchall()
-        
-        for m in murojaatlar:
-            javoblar = await db.get_murojaat_javoblar(m['id'])
-            javob_count = len(javoblar)
-            
-            ws2.append([
-                m['id'],
-                m['created_at'][:16],
-                m['full_name'],
-                m['phone'],
-                m['category'],
-                m['status'],
-                javob_count
-            ])
-        
-        # Styling
-        for ws in [wb['Statistika'], wb['Murojaatlar']]:
-            for row in ws.iter_rows():
-                for cell in row:
-                    cell.alignment = Alignment(horizontal='left', vertical='center')
-                    cell.border = Border(
-                        left=Side(style='thin'),
-                        right=Side(style='thin'),
-                        top=Side(style='thin'),
-                        bottom=Side(style='thin')
-                    )
+        ws2.append(styled_row(ws2, EXPORT_HEADERS))
         
-        filename = f"murojaatlar_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        filepath = os.path.join(MEDIA_PATH, filename)
+        row_count = 0
+        for rows in iter_export_rows(conn, chunk_size, filters, schemas):
+            for m in rows:
+                ws2.append(styled_row(ws2, export_row_values(m)))
+            row_count += len(rows)
+    finally:
+        conn.close()
+    
+    tmp_path = f"{filepath}.tmp"
+    wb.save(tmp_path)
+    os.replace(tmp_path, filepath)
+    return row_count
+
+def build_csv_report(db_path: str, filepath: str, stats: dict, chunk_size: int,
+                     filters: dict = None) -> int:
+    """CSV faylni sinxron yaratish: qatorlar to'g'ridan-to'g'ri faylga oqadi"""
+    conn = open_export_connection(db_path)
+    tmp_path = f"{filepath}.tmp"
+    row_count = 0
+    try:
+        schemas = connection_schemas(conn)
+        # utf-8-sig: Excel kirill/lotin harflarini to'g'ri ochishi uchun
+        with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_HEADERS)
+            for rows in iter_export_rows(conn, chunk_size, filters, schemas):
+                writer.writerows(export_row_values(m) for m in rows)
+                row_count += len(rows)
+    finally:
+        conn.close()
+    os.replace(tmp_path, filepath)
+    return row_count
+
+REPORT_BUILDERS = {
+    'xlsx': build_excel_report,
+    'csv': build_csv_report,
+}
+
+async def create_report(filepath: str, executor=None, fmt: str = 'xlsx', filters: dict = None):
+    """Hisobot yaratish (event loop ni bloklamasdan)"""
+    try:
+        stats = None if filters else await db.get_all_statistics()
         
-        wb.save(filepath)
-        logger.info(f"✅ Excel yaratildi: {filepath}")
+        loop = asyncio.get_running_loop()
+        row_count = await loop.run_in_executor(
+            executor, REPORT_BUILDERS[fmt], db.db_path, filepath, stats, EXPORT_CHUNK_SIZE, filters
+        )
+        logger.info(f"✅ Hisobot yaratildi: {filepath} ({row_count} ta qator)")
         
         return filepath
     
     except Exception as e:
-        logger.error(f"❌ Excel yaratish xatolik: {e}")
+        logger.error(f"❌ Hisobot yaratish xatolik: {e}")
         import traceback
         traceback.print_exc()
         return None
 
+class ExportJobs:
+    """Export fon vazifalari: bitta parallel yaratish va versiya bo'yicha kesh
+
+    Hisobot ma'lumotlar versiyasi (oxirgi murojaat, javob va status
+    o'zgarishi) bo'yicha keshlanadi. Bir xil versiya uchun parallel
+    /export lar bitta yaratishni kutadi. Kesh papkasi hajmi oshsa, eng eski
+    fayllar o'chiriladi.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, executor_kind: str = "thread"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.executor_kind = executor_kind
+        self._executor = None
+        self._inflight = {}
+    
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+        return self._executor
+    
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    async def _cache_key(self, *parts) -> str:
+        version = await db.get_data_version()
+        raw = repr((version, local_today().isoformat()) + parts)
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+    
+    async def get_report(self, fmt: str = 'xlsx', filters: dict = None) -> str:
+        """Keshdagi yoki yangi yaratilgan hisobot yo'li"""
+        filters = filters or {}
+        key = await self._cache_key(fmt, sorted((k, repr(v)) for k, v in filters.items()))
+        filepath = os.path.join(self.directory, f"murojaatlar_{key}.{fmt}")
+        
+        if os.path.exists(filepath):
+            os.utime(filepath)
+            logger.info(f"✅ Excel keshdan: {filepath}")
+            return filepath
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._build(key, filepath, fmt, filters))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+    
+    async def _build(self, key: str, filepath: str, fmt: str, filters: dict):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            result = await create_report(filepath, self._get_executor(), fmt, filters)
+            if result:
+                self._evict(keep=filepath)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _evict(self, keep: str):
+        """Kesh hajmi limitdan oshsa eng eski fayllarni o'chirish"""
+        try:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                os.remove(path)
+                total -= size
+                logger.info(f"🗑 Eski hisobot o'chirildi: {path}")
+        except Exception as e:
+            logger.error(f"❌ Export kesh tozalash xatolik: {e}")
+
+export_jobs = ExportJobs(
+    os.path.join(MEDIA_PATH, "exports"),
+    EXPORT_CACHE_MAX_MB * 1024 * 1024,
+    EXPORT_EXECUTOR
+)
+
 # ==================== GURUH KOMANDALAR ====================
+def render_trends(trends: dict) -> str:
+    """/stats uchun trendlar: qisqa davr kunlik, uzun davr haftalik, kategoriyalar ulushi"""
+    short, long = min(TREND_DAYS), max(TREND_DAYS)
+    recent, history = trends[short], trends[long]
+    daily = [total for _, total, _ in recent['days']]
+    totals = [total for _, total, _ in history['days']]
+    # Haftalar bugundan orqaga sanaladi, birinchi hafta to'liq bo'lmasligi mumkin
+    weekly = [sum(totals[max(0, end - 7):end]) for end in range(len(totals), 0, -7)][::-1]
+    
+    text = (
+        f"📉 <b>DINAMIKA:</b>\n"
+        f"   • {short} kun: <b>{recent['total']} ta</b>, javob berilgan: {recent['answered']} ta\n"
+        f"   <code>{sparkline(daily)}</code>\n"
+        f"   • {long} kun (haftalik): <b>{history['total']} ta</b>\n"
+        f"   <code>{sparkline(weekly)}</code>\n\n"
+    )
+    if recent['total']:
+        text += f"🥧 <b>KATEGORIYALAR ({short} kun):</b>\n"
+        for cat in recent['categories']:
+            share = cat['count'] / recent['total']
+            text += f"   • {cat['category']}: {share * 100:.0f}% {'█' * max(1, round(share * 10))}\n"
+        text += "\n"
+    return text
+
 @dp.message(Command("stats"))
 async def cmd_stats(message: Message):
     """Statistika - faqat guruhda"""
@@ -1075,6 +3838,9 @@ async def cmd_stats(message: Message):
         for cat in stats['categories']:
             categories_text += f"   • {cat['category']}: {cat['count']} ta\n"
         
+        trends = await db.get_daily_trends()
+        trends_text = render_trends(trends) if trends else ""
+        
         answered_percent = (stats['answered'] / stats['total'] * 100) if stats['total'] > 0 else 0
         pending_percent = (stats['pending'] / stats['total'] * 100) if stats['total'] > 0 else 0
         
@@ -1094,6 +3860,7 @@ async def cmd_stats(message: Message):
             f"📂 <b>KATEGORIYALAR:</b>\n"
             f"{categories_text}\n"
             
+            f"{trends_text}"
             "━━━━━━━━━━━━━━━━━━━━━━\n"
             f"🕐 {datetime.now().strftime('%Y-%m-%d %H:%M')}"
         )
@@ -1104,57 +3871,329 @@ async def cmd_stats(message: Message):
         logger.error(f"❌ Statistika xatolik: {e}")
         await message.answer(f"❌ Xatolik: {e}")
 
+def parse_export_args(args: str, chat_id: int):
+    """/export argumentlarini filtrlarga aylantirish
+
+    Format: /export [csv] [dan=YYYY-MM-DD] [gacha=YYYY-MM-DD]
+                    [status=yangi|javob] [kategoriya=hammasi|<nom boshi>]
+    Sanalarni kalitsiz ham berish mumkin: /export 2024-01-01 2024-01-31.
+    Kategoriya berilmasa, shu guruhga biriktirilgan kategoriyalar olinadi.
+    Qaytaradi: (format, filtrlar, tavsif qatorlari). Xatoda ValueError.
+    """
+    fmt = 'xlsx'
+    options = {}
+    dates = []
+    for token in (args or "").split():
+        lowered = token.lower()
+        if lowered in REPORT_BUILDERS:
+            fmt = lowered
+        elif "=" in token:
+            key, value = token.split("=", 1)
+            options[key.lower()] = value
+        else:
+            dates.append(token)
+    
+    if len(dates) > 2:
+        raise ValueError(f"Tushunarsiz argument: {dates[2]}")
+    if dates:
+        options.setdefault('dan', dates[0])
+    if len(dates) == 2:
+        options.setdefault('gacha', dates[1])
+    
+    unknown = set(options) - {'dan', 'gacha', 'status', 'kategoriya'}
+    if unknown:
+        raise ValueError(f"Noma'lum parametr: {', '.join(sorted(unknown))}")
+    
+    filters = {}
+    description = []
+    
+    def parse_date(value: str):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f"Noto'g'ri sana: {value} (format: YYYY-MM-DD)")
+    
+    if 'dan' in options:
+        date_from = parse_date(options['dan'])
+        filters['date_from'] = date_start_utc(date_from)
+        description.append(f"📅 Dan: {date_from}")
+    if 'gacha' in options:
+        date_to = parse_date(options['gacha'])
+        filters['date_to'] = date_start_utc(date_to + timedelta(days=1))
+        description.append(f"📅 Gacha: {date_to}")
+    
+    if 'status' in options:
+        value = options['status'].lower()
+        matches = [st for st in EXPORT_STATUSES if st.lower().startswith(value)]
+        if len(matches) != 1:
+            raise ValueError(f"Noma'lum status: {options['status']} (yangi | javob)")
+        filters['status'] = matches[0]
+        description.append(f"📊 Status: {matches[0]}")
+    
+    category_arg = options.get('kategoriya', '').lower()
+    if category_arg in ('hammasi', 'all'):
+        categories = []
+    elif category_arg:
+        categories = [cat for cat in CATEGORY_GROUPS if cat.lower().startswith(category_arg)]
+        if len(categories) != 1:
+            raise ValueError(f"Kategoriya topilmadi: {options['kategoriya']}")
+    else:
+        categories = get_group_categories(chat_id)
+        # Guruh barcha kategoriyalarni qabul qilsa, filtr kerak emas
+        if set(categories) == set(CATEGORY_GROUPS):
+            categories = []
+    if categories:
+        filters['categories'] = sorted(categories)
+        description.append(f"📂 Kategoriya: {', '.join(categories)}")
+    
+    return fmt, filters, description
+
 @dp.message(Command("export"))
-async def cmd_export(message: Message):
-    """Excel export - faqat guruhda"""
+async def cmd_export(message: Message, command: CommandObject):
+    """Excel/CSV export - faqat guruhda"""
     if message.chat.id not in get_all_group_ids():
         if message.chat.type == "private":
             await message.answer("❌ Bu komanda faqat guruhda ishlaydi!")
         return
     
     try:
-        wait_msg = await message.answer("📊 Excel yaratilmoqda...")
+        fmt, filters, description = parse_export_args(command.args, message.chat.id)
+    except ValueError as e:
+        await message.answer(
+            f"❌ {html.escape(str(e))}\n\n"
+            "Format: <code>/export [csv] [dan=YYYY-MM-DD] [gacha=YYYY-MM-DD] "
+            "[status=yangi|javob] [kategoriya=hammasi|nom]</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    try:
+        wait_msg = await message.answer(f"📊 {fmt.upper()} yaratilmoqda...")
         
-        excel_path = await create_excel_report()
+        report_path = await export_jobs.get_report(fmt, filters)
         
-        if not excel_path or not os.path.exists(excel_path):
-            await wait_msg.edit_text("❌ Excel yaratish xatolik.")
+        if not report_path or not os.path.exists(report_path):
+            await wait_msg.edit_text("❌ Hisobot yaratish xatolik.")
             return
         
-        excel_file = FSInputFile(excel_path)
+        filename = f"murojaatlar_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        report_file = FSInputFile(report_path, filename=filename)
+        filter_text = "\n".join(description) if description else "🌐 Barcha murojaatlar"
         await message.answer_document(
-            document=excel_file,
+            document=report_file,
             caption=(
                 "📊 <b>MUROJAATLAR HISOBOTI</b>\n\n"
                 f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-                f"📁 {os.path.basename(excel_path)}\n\n"
-                "📈 Faylda:\n"
-                "   • To'liq statistika\n"
-                "   • Barcha murojaatlar\n"
-                "   • Kategoriyalar\n\n"
-                "<i>Excel da ko'ring!</i>"
+                f"📁 {filename}\n\n"
+                f"{html.escape(filter_text)}"
             ),
             parse_mode="HTML"
         )
         
         await wait_msg.delete()
-        logger.info(f"✅ Excel yuborildi: {excel_path}")
-        
-        try:
-            os.remove(excel_path)
-        except:
-            pass
+        logger.info(f"✅ Hisobot yuborildi: {report_path}")
         
     except Exception as e:
         logger.error(f"❌ Export xatolik: {e}")
         await message.answer(f"❌ Xatolik: {e}")
 
+def fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+def build_search_match(query: str):
+    """Foydalanuvchi matnidan xavfsiz FTS5 MATCH ifodasi
+
+    Har bir so'z prefiks sifatida qidiriladi (ko'cha -> ko'chasi).
+    So'z bo'lmasa None.
+    """
+    terms = [term for term in query.replace('"', ' ').split() if any(ch.isalnum() for ch in term)]
+    if not terms:
+        return None
+    return " AND ".join(f"{fts_phrase(term)}*" for term in terms)
+
+def render_search_page(session: dict, rows: list, offset: int):
+    """Qidiruv natijalari sahifasi matnini Telegram limitidan oshirmay yig'ish
+
+    Qaytaradi: (matn, ko'rsatilgan qatorlar). Keyingi sahifa ko'rsatilgan
+    qatorlar sonidan boshlanadi, shuning uchun sig'magan qatorlar tushib qolmaydi.
+    """
+    if session['ranked']:
+        total_text = f"{session['total']} ta"
+    else:
+        total_text = f"{SEARCH_COUNT_LIMIT}+ ta, yangilari birinchi"
+    
+    def header(count: int) -> str:
+        return (
+            f"🔎 <b>QIDIRUV:</b> {html.escape(session['query'][:50])}\n"
+            f"Topildi: <b>{total_text}</b>"
+            f" ({offset + 1}-{offset + count})\n\n"
+        )
+    
+    # Tugmalar va HTML teglar uchun zaxira
+    budget = TELEGRAM_TEXT_LIMIT - 100
+    body = ""
+    shown = []
+    for row in rows:
+        # Bitta juda uzun so'z ham sahifani to'ldirib yubormasin
+        snippet = (row['snippet'] or "")[:300]
+        if snippet.count("\x02") > snippet.count("\x03"):
+            snippet += "\x03"
+        snippet = html.escape(snippet).replace("\x02", "<b>").replace("\x03", "</b>")
+        block = (
+            f"📋 <b>#{row['id']}</b> · 📅 {row['created_at'][:10]} · "
+            f"{'✅' if row['status'] == 'Javob berildi' else '⏳'} {row['status']}\n"
+            f"📂 {html.escape((row['category'] or '')[:50])}\n"
+            f"🏠 {html.escape((row['address'] or '')[:50])}\n"
+            f"💬 {snippet}\n"
+            f"━━━━━━━━━━\n"
+        )
+        if shown and text_length(header(len(shown) + 1) + body + block) > budget:
+            break
+        body += block
+        shown.append(row)
+    return header(len(shown)) + body, shown
+
+def get_search_keyboard(token: str, offset: int, shown: int, has_next: bool):
+    """Oldingi/keyingi sahifa tugmalari; keyingisi ko'rsatilgan qatorlardan keyin"""
+    buttons = []
+    if offset > 0:
+        buttons.append(InlineKeyboardButton(
+            text="⬅️ Oldingi", callback_data=f"srch:{token}:{max(0, offset - SEARCH_PAGE_SIZE)}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(
+            text="Keyingi ➡️", callback_data=f"srch:{token}:{offset + shown}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+@dp.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject):
+    """Murojaatlarni matn va manzil bo'yicha qidirish - faqat guruhda
+
+    /search <so'zlar> - shu guruh kategoriyalaridagi murojaatlar, bm25 bo'yicha
+    """
+    if message.chat.id not in get_all_group_ids():
+        if message.chat.type == "private":
+            await message.answer("❌ Bu komanda faqat guruhda ishlaydi!")
+        return
+    
+    if not db.fts_enabled:
+        await message.answer("⚠️ Qidiruv mavjud emas (SQLite FTS5 yo'q).")
+        return
+    
+    query = (command.args or "").strip()
+    categories = get_group_categories(message.chat.id)
+    # Guruh barcha kategoriyalarni qabul qilsa, filtr kerak emas
+    if set(categories) == set(CATEGORY_GROUPS):
+        categories = []
+    match = build_search_match(query)
+    if not match:
+        await message.answer(
+            "🔎 Foydalanish: <code>/search so'zlar</code>\n"
+            "Masalan: <code>/search Istiqlol ko'cha</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    total = await db.count_search(match, categories)
+    if not total:
+        await message.answer(f"📭 Hech narsa topilmadi: {html.escape(query)}", parse_mode="HTML")
+        return
+    
+    ranked = total <= SEARCH_COUNT_LIMIT
+    rows, has_next = await db.search_murojaatlar(match, categories, ranked=ranked)
+    token = secrets.token_hex(4)
+    session = {'query': query, 'match': match, 'categories': categories,
+               'chat_id': message.chat.id, 'total': total, 'ranked': ranked}
+    search_sessions.put(token, session)
+    text, shown = render_search_page(session, rows, 0)
+    await message.answer(
+        text,
+        reply_markup=get_search_keyboard(token, 0, len(shown), has_next or len(shown) < len(rows)),
+        parse_mode="HTML"
+    )
+
+@dp.callback_query(F.data.startswith("srch:"))
+async def search_page_callback(callback: CallbackQuery):
+    """Qidiruv sahifasini almashtirish"""
+    try:
+        _, token, offset = callback.data.split(":")
+        offset = int(offset)
+    except ValueError:
+        await callback.answer()
+        return
+    
+    session = search_sessions.get(token)
+    if not session or session['chat_id'] != callback.message.chat.id:
+        await callback.answer("⌛ Qidiruv eskirgan, qaytadan /search qiling")
+        return
+    
+    rows, has_next = await db.search_murojaatlar(
+        session['match'], session['categories'], offset=offset, ranked=session['ranked'])
+    if not rows:
+        await callback.answer("📭 Boshqa natija yo'q")
+        return
+    
+    text, shown = render_search_page(session, rows, offset)
+    await callback.message.edit_text(
+        text,
+        reply_markup=get_search_keyboard(token, offset, len(shown), has_next or len(shown) < len(rows)),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+@dp.message(Command("dbprofile"))
+async def cmd_dbprofile(message: Message, command: CommandObject):
+    """SQL statement lar profili - faqat guruhda
+
+    /dbprofile [N] - jami vaqt bo'yicha eng og'ir N ta statement
+    /dbprofile reset - hisobni tozalash
+    """
+    if message.chat.id not in get_all_group_ids():
+        if message.chat.type == "private":
+            await message.answer("❌ Bu komanda faqat guruhda ishlaydi!")
+        return
+    
+    args = (command.args or "").strip().lower()
+    if args == "reset":
+        query_profiler.reset()
+        await message.answer("✅ DB profil tozalandi.")
+        return
+    
+    limit = int(args) if args.isdigit() else 10
+    items = query_profiler.snapshot()
+    if not items:
+        await message.answer("📭 Hali so'rovlar yo'q." if DB_PROFILE else "⚠️ DB_PROFILE o'chirilgan.")
+        return
+    
+    total_ms = sum(entry['total_ms'] for _, entry in items)
+    header = (
+        "🗄 <b>DB PROFIL</b>\n"
+        f"Statementlar: {len(items)} ta, jami: {total_ms:.0f}ms, "
+        f"sekin (≥{query_profiler.slow_ms:g}ms): {sum(e['slow'] for _, e in items)} ta\n\n"
+    )
+    blocks = []
+    for sql, entry in items[:limit]:
+        block = (
+            f"<code>{html.escape(sql[:160], quote=False)}</code>\n"
+            f"   {entry['count']}x, jami {entry['total_ms']:.1f}ms, "
+            f"o'rtacha {entry['total_ms'] / entry['count']:.2f}ms, max {entry['max_ms']:.1f}ms, "
+            f"qator {entry['rows']}, sekin {entry['slow']}\n"
+        )
+        if entry['plan']:
+            block += f"   📋 <i>{html.escape(entry['plan'][:200], quote=False)}</i>\n"
+        blocks.append(block)
+    
+    response = header
+    for block in blocks:
+        if text_length(response + block) > TELEGRAM_TEXT_LIMIT:
+            break
+        response += block
+    await message.answer(response, parse_mode="HTML")
+
 @dp.message(Command("debug"))
 async def cmd_debug(message: Message):
     """Debug"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db_conn:
-            db_conn.row_factory = aiosqlite.Row
+        async with db.reader() as db_conn:
             async with db_conn.execute(
                 "SELECT id, user_id, full_name, group_message_id, status, created_at FROM murojaatlar ORDER BY id DESC LIMIT 5"
             ) as cursor:
@@ -1181,9 +4220,177 @@ async def cmd_debug(message: Message):
     except Exception as e:
         await message.answer(f"❌ Xatolik: {e}")
 
+# ==================== WEBHOOK ====================
+class WebhookServer:
+    """Webhook orqali update qabul qilish (polling o'rniga)
+
+    Har bir POST secret token bo'yicha tekshiriladi, update fon vazifasiga
+    berilib darhol 200 qaytariladi. Parallel ishlov berish
+    ``max_concurrency`` bilan cheklanadi. Telegramga ulanmasdan ham
+    yozib olingan update JSON ni endpointga POST qilib sinash mumkin.
+    """
+    
+    SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+    
+    def __init__(self, bot: Bot, dispatcher: Dispatcher, path: str = WEBHOOK_PATH,
+                 secret: str = WEBHOOK_SECRET, max_concurrency: int = WEBHOOK_MAX_CONCURRENCY):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret = secret
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self._runner = None
+    
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret and not secrets.compare_digest(
+                request.headers.get(self.SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        
+        try:
+            update = types.Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"⚠️ Noto'g'ri webhook update: {e}")
+            return web.Response(status=400)
+        
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+    
+    async def _process(self, update: types.Update):
+        async with self._semaphore:
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"❌ Update ishlov berish xatolik: {e}")
+    
+    async def start(self, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT):
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"✅ Webhook server: http://{host}:{port}{self.path}")
+    
+    async def stop(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+def install_stop_signals(stop: asyncio.Event) -> list:
+    """SIGTERM/SIGINT da ``stop`` ni o'rnatish (start_polling kabi), o'rnatilgan signallar ro'yxati"""
+    loop = asyncio.get_running_loop()
+    installed = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+            installed.append(sig)
+        except (NotImplementedError, RuntimeError):
+            # Windows yoki asosiy bo'lmagan thread
+            pass
+    return installed
+
+async def run_webhook():
+    """Webhook rejimida ishlash: SIGTERM/SIGINT (masalan, Railway redeploy) kelguncha
+
+    To'xtatilganda server va dispatcher shutdown (FSM buferi, database) bajariladi.
+    """
+    secret = WEBHOOK_SECRET
+    if WEBHOOK_URL and not secret:
+        secret = secrets.token_urlsafe(32)
+    
+    stop = asyncio.Event()
+    signals = install_stop_signals(stop)
+    server = WebhookServer(bot, dp, secret=secret)
+    await dp.emit_startup(bot=bot)
+    try:
+        await server.start()
+        if WEBHOOK_URL:
+            await bot.set_webhook(
+                f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=secret,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+            logger.info(f"✅ Webhook o'rnatildi: {WEBHOOK_URL}")
+        else:
+            logger.warning("⚠️ WEBHOOK_URL berilmagan: webhook Telegramda o'rnatilmadi (lokal rejim)")
+        await stop.wait()
+        logger.info("⏹ To'xtatish signali olindi, webhook server yopilmoqda")
+    finally:
+        loop = asyncio.get_running_loop()
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+        await server.stop()
+        await dp.emit_shutdown(bot=bot)
+
+# ==================== METRIKALAR SERVERI ====================
+def fsm_state_counts() -> dict:
+    """FSM holati bo'yicha faol sessiyalar"""
+    if isinstance(fsm_storage, SQLiteStorage):
+        counts = fsm_storage.state_counts()
+    else:
+        counts = {}
+        for record in getattr(fsm_storage, "storage", {}).values():
+            if record.state:
+                counts[record.state] = counts.get(record.state, 0) + 1
+    return {(state,): count for state, count in counts.items()}
+
+def register_runtime_gauges(reminders: ReminderScheduler = None):
+    """FSM va navbatlar holati uchun gauge lar"""
+    def queue_depths():
+        depths = {
+            ("send",): send_scheduler.queue_depth,
+            ("db_write",): db.write_queue_depth,
+            ("media_archive",): media_store.pending,
+            ("export",): export_jobs.inflight,
+        }
+        if isinstance(fsm_storage, SQLiteStorage):
+            depths[("fsm_flush",)] = fsm_storage.pending_writes
+        if reminders is not None:
+            depths[("escalation",)] = reminders.tracked
+        return depths
+    
+    metrics.register(Gauge("bot_fsm_sessions", "Faol FSM sessiyalar", fsm_state_counts, ("state",)))
+    metrics.register(Gauge("bot_queue_depth", "Navbatlar uzunligi", queue_depths, ("queue",)))
+    metrics.register(Gauge("bot_reply_cache_size", "Reply keshidagi yozuvlar", lambda: len(reply_cache)))
+
+class MetricsServer:
+    """Prometheus text formatidagi /metrics endpoint"""
+    
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.registry = registry
+        self._runner = None
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+    
+    async def start(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"✅ Metrikalar: http://{host}:{port}/metrics")
+    
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
 # ==================== MAIN ====================
 async def main():
     """Asosiy funksiya"""
+    scheduler = None
+    metrics_server = None
     try:
         os.makedirs(MEDIA_PATH, exist_ok=True)
         logger.info(f"✅ Media papka: {MEDIA_PATH}")
@@ -1191,26 +4398,60 @@ async def main():
         await db.init_db()
         logger.info("✅ Database tayyor")
         
-        scheduler = ReminderScheduler(bot)
-        scheduler.start()
+        await quota.warm(db)
+        
+        if isinstance(fsm_storage, SQLiteStorage):
+            await fsm_storage.start(db)
+        
+        scheduler = ReminderScheduler(bot, db)
+        await scheduler.start()
+        if DB_JOURNAL_MODE.upper() == "WAL":
+            scheduler.scheduler.add_job(db.checkpoint, 'interval', seconds=DB_CHECKPOINT_INTERVAL)
+        scheduler.scheduler.add_job(db.optimize, 'interval', seconds=DB_OPTIMIZE_INTERVAL)
+        scheduler.scheduler.add_job(
+            media_collector.run, 'interval', seconds=MEDIA_GC_INTERVAL,
+            next_run_time=datetime.now() + timedelta(minutes=1)
+        )
+        if ARCHIVE_AFTER_DAYS > 0:
+            scheduler.scheduler.add_job(
+                db.archive_answered, 'interval', seconds=ARCHIVE_INTERVAL,
+                next_run_time=datetime.now() + timedelta(minutes=5)
+            )
         logger.info("✅ Scheduler tayyor")
+        
+        register_runtime_gauges(scheduler)
+        if METRICS_PORT:
+            metrics_server = MetricsServer()
+            await metrics_server.start()
 
         logger.info("🤖 Bot ishga tushmoqda...")
         logger.info(f"📊 Limit: {DAILY_LIMIT}/kun")
-        logger.info(f"⏰ Eslatma: {REMINDER_DAYS} kun")
+        logger.info(f"⏰ Eslatma bosqichlari: {', '.join(f'{d:g}' for d in ESCALATION_TIERS)} kun")
         logger.info(f"👥 Default Guruh: {GROUP_CHAT_ID}")
         logger.info("📂 Kategoriya guruhlari:")
         for category, group_id in CATEGORY_GROUPS.items():
             logger.info(f"   - {category}: {group_id}")
         logger.info("✅ Bot ishga tushdi!")
         
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await dp.start_polling(bot)
         
     except Exception as e:
         logger.error(f"❌ Bot xatolik: {e}")
         import traceback
         traceback.print_exc()
     finally:
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if scheduler is not None:
+            await scheduler.stop()
+        export_jobs.shutdown()
+        await media_store.close()
+        await fsm_storage.close()
+        await db.close()
+        await send_scheduler.close()
         await bot.session.close()
 
 if __name__ == "__main__":
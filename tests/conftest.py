@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Modul import paytida DB_PATH va MEDIA_PATH o'qiladi: haqiqiy bazaga tegmaslik uchun
+_TMP = tempfile.mkdtemp(prefix="murojaat_test_")
+os.environ["DB_PATH"] = os.path.join(_TMP, "bot.db")
+os.environ["MEDIA_PATH"] = os.path.join(_TMP, "media")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bot_railway_full as app  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Vaqtinchalik fayllardagi Database (arxiv bilan), init_db chaqirilmagan"""
+    database = app.Database()
+    database.db_path = str(tmp_path / "bot.db")
+    database.archive_path = str(tmp_path / "bot_archive.db")
+    return database
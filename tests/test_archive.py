@@ -0,0 +1,56 @@
+import asyncio
+
+import bot_railway_full as app
+
+
+async def seed(database, pending: int = 4, answered: int = 6):
+    """Yangi baza: ``answered`` ta murojaat arxivga ko'chiriladi, ``pending`` tasi qoladi"""
+    await database.init_db()
+    for i in range(pending + answered):
+        murojaat_id = await database.add_murojaat(
+            1, "Ali", "AA1", "+998", "Istiqlol", "Boshqa", "suv quvuri", group_message_id=500 + i)
+        if i < answered:
+            await database.add_javob_with_status(murojaat_id, 1, "admin", "javob")
+    async with database.writer() as conn:
+        await conn.execute("UPDATE murojaatlar SET admin_checked_at = '2020-01-01 00:00:00' "
+                           "WHERE status = 'Javob berildi'")
+    assert await database.archive_answered(days=30) == answered
+
+
+def test_attached_readers_keep_main_tables(database):
+    async def scenario():
+        await seed(database)
+        try:
+            # Har bir hovuz ulanishiga arxiv birinchi bo'lib ATTACH qilinadi
+            for _ in range(database.read_pool_size):
+                async with database.reader(archive=True) as conn:
+                    async with conn.execute("SELECT COUNT(*) FROM murojaatlar WHERE status = 'Yangi'") as cursor:
+                        assert (await cursor.fetchone())[0] == 4
+            assert len(await database.get_pending_murojaatlar()) == 4
+            pending = await database.get_murojaat_by_group_msg(509)
+            assert pending is not None and pending['status'] == 'Yangi'
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_history_and_stats_span_archive(database):
+    async def scenario():
+        await seed(database)
+        try:
+            assert len(await database.get_user_murojaatlar(1)) == 10
+            rows, has_more, total = await database.get_user_murojaatlar_page(1, 5)
+            assert (len(rows), has_more, total) == (5, True, 10)
+            older, has_more, _ = await database.get_user_murojaatlar_page(1, 5, rows[-1]['id'])
+            assert not has_more
+            assert {row['id'] for row in rows + older} == set(range(1, 11))
+            assert len(await database.get_murojaat_javoblar(1)) == 1
+            stats = await database.get_all_statistics()
+            assert (stats['total'], stats['answered'], stats['pending']) == (10, 6, 4)
+            # Arxivdagi murojaatga javob qabul qilinmaydi
+            assert not await database.add_javob_with_status(1, 1, "admin", "yana")
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,63 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import bot_railway_full as app
+
+
+def key(user_id: int) -> app.StorageKey:
+    return app.StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+async def stored_keys(database) -> set:
+    async with database.reader() as conn:
+        async with conn.execute("SELECT key FROM fsm_states") as cursor:
+            return {app.SQLiteStorage._key_from_str(row['key']).user_id for row in await cursor.fetchall()}
+
+
+def test_flush_skips_unserializable_record(database):
+    async def scenario():
+        await database.init_db()
+        storage = app.SQLiteStorage(flush_interval=60)
+        await storage.start(database)
+        try:
+            await storage.set_data(key(1), {'text': "suv"})
+            await storage.set_data(key(2), {'photo': object()})
+            await storage.set_state(key(3), "Form:text")
+            await storage.flush()
+            assert await stored_keys(database) == {1, 3}
+            assert storage.pending_writes == 0
+            # Xotiradagi holat saqlanib qoladi
+            assert await storage.get_data(key(1)) == {'text': "suv"}
+        finally:
+            await storage.close()
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_requeues_serialized_keys(database, monkeypatch):
+    async def scenario():
+        await database.init_db()
+        storage = app.SQLiteStorage(flush_interval=60)
+        await storage.start(database)
+        try:
+            await storage.set_data(key(1), {'text': "suv"})
+            await storage.set_data(key(2), {'photo': object()})
+
+            @asynccontextmanager
+            async def broken_writer():
+                raise RuntimeError("database is locked")
+                yield
+
+            with monkeypatch.context() as patch:
+                patch.setattr(database, "writer", broken_writer)
+                await storage.flush()
+            assert storage._dirty == {key(1)}
+
+            await storage.flush()
+            assert await stored_keys(database) == {1}
+        finally:
+            await storage.close()
+            await database.close()
+
+    asyncio.run(scenario())
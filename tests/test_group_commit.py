@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+
+def test_committer_survives_failed_rollback(database, monkeypatch):
+    async def scenario():
+        database.group_commit = True
+        await database.init_db()
+        try:
+            writer = database._writer
+
+            async def broken(*args, **kwargs):
+                raise RuntimeError("disk xatosi")
+
+            async def insert(db):
+                await db.execute("INSERT INTO users (user_id, full_name) VALUES (1, 'Ali')")
+
+            with monkeypatch.context() as patch:
+                patch.setattr(writer, "commit", broken)
+                patch.setattr(writer, "rollback", broken)
+                with pytest.raises(RuntimeError, match="disk xatosi"):
+                    await asyncio.wait_for(database._write(insert), 5)
+
+            # Navbat to'xtamagan va ochiq qolgan tranzaksiya bekor qilingan
+            assert not database._committer.done()
+            await asyncio.wait_for(database._write(insert), 5)
+            async with database.reader() as conn:
+                async with conn.execute("SELECT COUNT(*) FROM users") as cursor:
+                    assert (await cursor.fetchone())[0] == 1
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,198 @@
+"""Asosiy so'rovlar indeksdan foydalanishi: Database metodlari va export
+bajaradigan aynan o'sha SQL (arxiv ulangan, UNION ALL qismlari bilan)
+yozib olinadi va har biri EXPLAIN QUERY PLAN bilan tekshiriladi."""
+import asyncio
+
+import aiosqlite
+import pytest
+
+import bot_railway_full as app
+
+CATEGORIES = list(app.CATEGORY_GROUPS)
+
+
+async def seed(database, users: int = 20, per_user: int = 10):
+    """Murojaatlar va javoblar; yarmi arxivga ko'chiriladi, ANALYZE bilan"""
+    await database.init_db()
+    murojaat_id = 0
+    for user_id in range(1, users + 1):
+        for k in range(per_user):
+            murojaat_id = await database.add_murojaat(
+                user_id, "Aliyev Vali", "AA1234567", "+998901234567", "Istiqlol ko'chasi",
+                CATEGORIES[murojaat_id % len(CATEGORIES)], f"suv quvuri {k}",
+                group_message_id=1000 + murojaat_id,
+            )
+            if murojaat_id % 2:
+                await database.add_javob_with_status(murojaat_id, 1, "admin", "javob")
+    async with database.writer() as conn:
+        await conn.execute("UPDATE murojaatlar SET admin_checked_at = '2020-01-01 00:00:00' "
+                           "WHERE status = 'Javob berildi'")
+        # Bugungi murojaatlar oz bo'lsin: qolganlari oldingi kunlarga taqsimlanadi
+        await conn.execute("UPDATE murojaatlar SET created_at = datetime(created_at, '-' || (id % 60 + 1) || ' days') "
+                           "WHERE user_id < ?", (users,))
+    assert await database.archive_answered(days=30) > 0
+    async with database._archive_writer():
+        async with database.writer() as conn:
+            await conn.execute("ANALYZE")
+
+
+async def record_statements(monkeypatch, call):
+    """``call`` bajarganda aiosqlite orqali yuborilgan (sql, parametrlar)"""
+    statements = []
+    original = aiosqlite.Connection.execute
+
+    def execute(self, sql, parameters=None):
+        statements.append((sql, parameters))
+        return original(self, sql, parameters)
+
+    monkeypatch.setattr(aiosqlite.Connection, "execute", execute)
+    try:
+        await call()
+    finally:
+        monkeypatch.setattr(aiosqlite.Connection, "execute", original)
+    return statements
+
+
+class RecordingConnection:
+    """Export (sqlite3) ulanishi uchun: bajarilgan statement larni yozib oladi"""
+
+    def __init__(self, conn, statements):
+        self._conn = conn
+        self._statements = statements
+
+    def execute(self, sql, parameters=()):
+        self._statements.append((sql, parameters))
+        return self._conn.execute(sql, parameters)
+
+
+async def explain(database, sql, parameters):
+    async with database.reader(archive=True) as conn:
+        async with conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ()) as cursor:
+            return [row[3] for row in await cursor.fetchall()]
+
+
+def full_scans(details):
+    """Jadvalni indekssiz o'qish yoki vaqtinchalik saralash"""
+    return [
+        detail for detail in details
+        if "TEMP B-TREE" in detail
+        or (detail.startswith("SCAN") and "USING" not in detail and "VIRTUAL TABLE" not in detail
+            and "subquery" not in detail and "CONSTANT ROW" not in detail)
+    ]
+
+
+async def check_plans(database, statements, expected: str, forbidden: str = None, allow_sort: bool = False):
+    """Har bir SELECT to'liq skansiz; ``expected`` kamida bitta statement ning barcha qismlarida.
+    ``allow_sort`` — indeks bilan topilgan qatorlarni vaqtinchalik saralashga ruxsat"""
+    checked = 0
+    covered = False
+    for sql, parameters in statements:
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH")) or "sqlite_master" in sql:
+            continue
+        details = await explain(database, sql, parameters)
+        plan = " | ".join(details)
+        bad = full_scans(details)
+        if allow_sort:
+            bad = [detail for detail in bad if "TEMP B-TREE FOR" not in detail]
+        assert not bad, f"{plan}\n{sql}"
+        if forbidden:
+            assert forbidden not in plan, f"{plan}\n{sql}"
+        arms = 1 + ("archive." in sql)
+        covered |= plan.count(expected) >= arms
+        checked += 1
+    assert checked, "SELECT bajarilmadi"
+    assert covered, f"{expected} ishlatilmadi:\n" + "\n".join(sql for sql, _ in statements)
+
+
+@pytest.fixture
+def seeded(database):
+    asyncio.run(seed(database))
+    return database
+
+
+def run_checks(database, monkeypatch, call, *args, **kwargs):
+    async def scenario():
+        try:
+            statements = await record_statements(monkeypatch, call)
+            assert database.archive_ready
+            await check_plans(database, statements, *args, **kwargs)
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_group_message_lookup(seeded, monkeypatch):
+    run_checks(seeded, monkeypatch, lambda: seeded.get_murojaat_by_group_msg(1005),
+               "idx_murojaatlar_group_msg")
+
+
+def test_user_history(seeded, monkeypatch):
+    run_checks(seeded, monkeypatch, lambda: seeded.get_user_murojaatlar(3),
+               "idx_murojaatlar_user_created")
+
+
+def test_user_history_pages(seeded, monkeypatch):
+    async def pages():
+        rows, _, _ = await seeded.get_user_murojaatlar_page(3, 3)
+        older, _, _ = await seeded.get_user_murojaatlar_page(3, 3, rows[-1]['id'])
+        await seeded.get_user_murojaatlar_page(3, 3, older[0]['id'], newer=True)
+
+    run_checks(seeded, monkeypatch, pages, "idx_murojaatlar_user_created")
+
+
+def test_pending(seeded, monkeypatch):
+    run_checks(seeded, monkeypatch, seeded.get_pending_murojaatlar, "idx_murojaatlar_status_created")
+
+
+def test_daily_counts(seeded, monkeypatch):
+    # Bugungi oz sonli qatorlar guruhlanadi, butun jadval emas
+    run_checks(seeded, monkeypatch, lambda: seeded.get_daily_counts(app.day_start_utc()),
+               "idx_murojaatlar_created", allow_sort=True)
+
+
+def test_answers(seeded, monkeypatch):
+    run_checks(seeded, monkeypatch, lambda: seeded.get_murojaat_javoblar(1),
+               "idx_javoblar_murojaat_created")
+
+
+def test_daily_trends(seeded, monkeypatch):
+    run_checks(seeded, monkeypatch, seeded.get_daily_trends, "PRIMARY KEY (day>?)")
+
+
+@pytest.mark.parametrize("ranked", [False, True])
+def test_search(seeded, monkeypatch, ranked):
+    async def search():
+        match = app.build_search_match("suv")
+        await seeded.count_search(match, CATEGORIES[:1])
+        await seeded.search_murojaatlar(match, CATEGORIES[:1], ranked=ranked)
+
+    # Kategoriya indeksi FTS dan oldin tanlansa, har bir qator uchun MATCH bajariladi
+    run_checks(seeded, monkeypatch, search, "VIRTUAL TABLE INDEX",
+               forbidden="idx_murojaatlar_category_created", allow_sort=ranked)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    (None, "idx_murojaatlar_created"),
+    ({'categories': CATEGORIES[:1]}, "idx_murojaatlar_category_created"),
+])
+def test_export_chunks(seeded, monkeypatch, filters, expected):
+    async def export():
+        statements = []
+        conn = app.open_export_connection(seeded.db_path, seeded.archive_path)
+        try:
+            schemas = app.connection_schemas(conn)
+            assert schemas == ("main", "archive")
+            chunks = list(app.iter_export_rows(RecordingConnection(conn, statements), 25, filters, schemas))
+            assert len(chunks) > 1
+        finally:
+            conn.close()
+        return statements
+
+    async def scenario():
+        try:
+            await check_plans(seeded, await export(), expected)
+        finally:
+            await seeded.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import bot_railway_full as app
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+async def seed(database, ages_days):
+    """Har bir yosh (kun) uchun bitta javobsiz murojaat"""
+    await database.init_db()
+    ids = []
+    for age in ages_days:
+        murojaat_id = await database.add_murojaat(
+            1, "Ali", "AA1", "+998", "Istiqlol", "Boshqa", "suv", group_message_id=None)
+        async with database.writer() as conn:
+            await conn.execute("UPDATE murojaatlar SET created_at = datetime('now', ?) WHERE id = ?",
+                               (f"-{age} days", murojaat_id))
+        ids.append(murojaat_id)
+    return ids
+
+
+async def escalate(reminders):
+    await reminders._escalate(time.time())
+    await asyncio.gather(*list(reminders._send_tasks))
+
+
+async def levels(database):
+    async with database.reader() as conn:
+        async with conn.execute("SELECT id, escalation_level FROM murojaatlar ORDER BY id") as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+
+def test_overdue_tiers_send_only_highest(database):
+    async def scenario():
+        try:
+            old, middle, fresh = await seed(database, [10, 4, 0])
+            bot = FakeBot()
+            reminders = app.ReminderScheduler(bot, database, tiers=[1, 3, 7])
+            await reminders.rebuild()
+            await escalate(reminders)
+            await escalate(reminders)
+
+            # Har bir bosqich uchun bitta xabar: 10 kunlik - 3-bosqich, 4 kunlik - 2-bosqich
+            assert len(bot.sent) == 2
+            texts = sorted(text for _, text in bot.sent)
+            assert "Bosqich: 2/3" in texts[0] and f"#{middle}" in texts[0]
+            assert "Bosqich: 3/3" in texts[1] and f"#{old}" in texts[1]
+            assert await levels(database) == {old: 3, middle: 2, fresh: 0}
+            assert reminders._pending[middle]['level'] == 2
+            assert old not in reminders._pending
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_send_keeps_level_and_retries(database):
+    async def scenario():
+        try:
+            (murojaat_id,) = await seed(database, [2])
+            bot = FakeBot()
+            failures = []
+
+            async def send_message(chat_id, text, **kwargs):
+                if not failures:
+                    failures.append(chat_id)
+                    raise RuntimeError("Telegram server xatosi")
+                bot.sent.append((chat_id, text))
+
+            bot.send_message = send_message
+            reminders = app.ReminderScheduler(bot, database, tiers=[1, 3])
+            await reminders.rebuild()
+            await escalate(reminders)
+
+            # Yuborilmagan bosqich saqlanmaydi va kechikish bilan navbatga qaytadi
+            assert failures and not bot.sent
+            assert await levels(database) == {murojaat_id: 0}
+            assert [(level, i) for _, i, level in reminders._heap] == [(0, murojaat_id)]
+            retry_at = reminders._heap[0][0]
+            assert retry_at >= time.time() + reminders.RETRY_DELAY - 5
+
+            await reminders._escalate(retry_at)
+            await asyncio.gather(*list(reminders._send_tasks))
+            assert len(bot.sent) == 1 and "Bosqich: 1/2" in bot.sent[0][1]
+            assert await levels(database) == {murojaat_id: 1}
+            assert reminders._pending[murojaat_id]['level'] == 1
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
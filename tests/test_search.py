@@ -0,0 +1,90 @@
+import asyncio
+
+import bot_railway_full as app
+
+
+async def seed_split(database, archived: int, fresh: int):
+    """``archived`` ta eski javob berilgan murojaat arxivga, ``fresh`` tasi asosiy bazada"""
+    await database.init_db()
+    for i in range(archived + fresh):
+        await database.add_murojaat(1, "Ali", "AA1", "+998", "Istiqlol", "Boshqa", f"suv quvuri {i}")
+    for murojaat_id in range(1, archived + 1):
+        await database.add_javob_with_status(murojaat_id, 1, "admin", "javob")
+    async with database.writer() as conn:
+        await conn.execute("UPDATE murojaatlar SET admin_checked_at = '2020-01-01 00:00:00' WHERE id <= ?",
+                           (archived,))
+    assert await database.archive_answered(days=30) == archived
+
+
+def test_page_boundary_on_archive_split(database):
+    async def scenario():
+        await seed_split(database, archived=3, fresh=3)
+        match = app.build_search_match("suv")
+        try:
+            # Keyingi sahifani bildiruvchi qator yagona arxiv qatori
+            rows, has_next = await database.search_murojaatlar(match, limit=3, ranked=False)
+            assert [row['id'] for row in rows] == [6, 5, 4]
+            assert has_next
+            rows, has_next = await database.search_murojaatlar(match, limit=3, offset=3, ranked=False)
+            assert [row['id'] for row in rows] == [3, 2, 1]
+            assert not has_next
+            assert all("\x02suv\x03" in row['snippet'] for row in rows)
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_count_includes_archive(database):
+    async def scenario():
+        await seed_split(database, archived=2, fresh=3)
+        try:
+            assert await database.count_search(app.build_search_match("suv quvur")) == 5
+            assert await database.count_search(app.build_search_match("yoq")) == 0
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_long_rows_are_paged_not_dropped(database):
+    async def scenario():
+        await database.init_db()
+        for i in range(5):
+            await database.add_murojaat(1, "Ali", "AA1", "+998", "Istiqlol " + "uy" * 800,
+                                        "Boshqa", f"suv quvuri {i} " + "x" * 5000)
+        match = app.build_search_match("suv")
+        session = {'query': "suv " * 2000, 'total': 5, 'ranked': False}
+        try:
+            seen = []
+            offset = 0
+            while offset is not None:
+                rows, has_next = await database.search_murojaatlar(match, offset=offset, ranked=False)
+                text, shown = app.render_search_page(session, rows, offset)
+                assert shown and app.text_length(text) <= app.TELEGRAM_TEXT_LIMIT - 100
+                assert f"({offset + 1}-{offset + len(shown)})" in text
+                seen += [row['id'] for row in shown]
+                keyboard = app.get_search_keyboard("t", offset, len(shown), has_next or len(shown) < len(rows))
+                buttons = {b.text: b.callback_data for b in keyboard.inline_keyboard[0]} if keyboard else {}
+                offset = int(buttons["Keyingi ➡️"].split(":")[2]) if "Keyingi ➡️" in buttons else None
+            assert seen == [5, 4, 3, 2, 1]
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_render_stops_at_limit_and_reports_shown(monkeypatch):
+    rows = [{'id': i, 'created_at': "2026-01-01 10:00:00", 'status': "Yangi", 'category': "Boshqa",
+             'address': "Istiqlol", 'snippet': "\x02suv\x03 " + "a" * 400} for i in range(5, 0, -1)]
+    session = {'query': "suv", 'total': 5, 'ranked': True}
+    monkeypatch.setattr(app, "TELEGRAM_TEXT_LIMIT", 1200)
+    text, shown = app.render_search_page(session, rows, 5)
+    assert [row['id'] for row in shown] == [5, 4]
+    assert "(6-7)" in text and "#3" not in text
+    assert "a" * 301 not in text and text.count("<b>suv</b>") == 2
+    keyboard = app.get_search_keyboard("t", 5, len(shown), True)
+    assert keyboard.inline_keyboard[0][1].callback_data == "srch:t:7"
+    # Limitdan uzun bo'lsa ham bitta qator ko'rsatiladi
+    monkeypatch.setattr(app, "TELEGRAM_TEXT_LIMIT", 200)
+    assert len(app.render_search_page(session, rows, 0)[1]) == 1
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import bot_railway_full as app
+
+
+def max_in_window(times, window: float) -> int:
+    """Istalgan [t, t + window) oralig'idagi eng ko'p yuborishlar soni"""
+    times = sorted(times)
+    best = start = 0
+    for end, t in enumerate(times):
+        while t - times[start] >= window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def grant_times(scheduler, sends):
+    """``sends``: (chat_id, priority) ro'yxati; har biri ruxsat olgan vaqt va tartib"""
+    granted = []
+
+    async def send(index, chat_id, priority):
+        await scheduler.acquire(chat_id, priority)
+        granted.append((time.monotonic(), index, chat_id))
+
+    try:
+        await asyncio.gather(*(send(i, chat_id, priority) for i, (chat_id, priority) in enumerate(sends)))
+    finally:
+        await scheduler.close()
+    return granted
+
+
+def test_private_chat_window_limit():
+    scheduler = app.SendScheduler(global_rate=100, private_rate=5, private_burst=2)
+    granted = asyncio.run(grant_times(scheduler, [(1, app.PRIORITY_INTERACTIVE)] * 8))
+    times = [t for t, _, _ in granted]
+    assert max_in_window(times, 1.0) <= 5 + 2
+    assert max_in_window(times, 0.5) <= 2 + 5 * 0.5
+
+
+def test_group_and_global_window_limits():
+    # Guruh: daqiqasiga 120 -> 1 s da 2 + burst dan oshmaydi (for_limit kafolati 60 s uchun)
+    scheduler = app.SendScheduler(global_rate=8, group_per_minute=120, burst=2)
+    sends = [(-100, app.PRIORITY_BULK)] * 4 + [(chat_id, app.PRIORITY_INTERACTIVE) for chat_id in range(1, 15)]
+    granted = asyncio.run(grant_times(scheduler, sends))
+    assert max_in_window([t for t, _, _ in granted], 1.0) <= 8
+    group_times = [t for t, _, chat_id in granted if chat_id == -100]
+    assert max_in_window(group_times, 1.0) <= 2 + 120 / 60
+
+
+def test_interactive_before_bulk():
+    scheduler = app.SendScheduler(global_rate=20, burst=1)
+    sends = [(-100 - n, app.PRIORITY_BULK) for n in range(5)]
+    sends += [(n, app.PRIORITY_INTERACTIVE) for n in range(1, 6)]
+    granted = asyncio.run(grant_times(scheduler, sends))
+    order = [index for _, index, _ in sorted(granted)]
+    assert order == [5, 6, 7, 8, 9, 0, 1, 2, 3, 4]
+
+
+def test_blocked_chat_does_not_hold_queue():
+    scheduler = app.SendScheduler(global_rate=100, private_rate=1, private_burst=1)
+    sends = [(1, app.PRIORITY_INTERACTIVE)] * 2 + [(2, app.PRIORITY_BULK)]
+    granted = asyncio.run(grant_times(scheduler, sends))
+    order = [index for _, index, _ in sorted(granted)]
+    # Chat 1 limitda turganida ommaviy xabar chat 2 ga o'tadi
+    assert order == [0, 2, 1]
+
+
+def test_private_burst_replies_do_not_wait():
+    scheduler = app.SendScheduler(private_rate=1, private_burst=3)
+    start = time.monotonic()
+    granted = asyncio.run(grant_times(scheduler, [(1, app.PRIORITY_INTERACTIVE)] * 3))
+    assert max(t for t, _, _ in granted) - start < 0.1
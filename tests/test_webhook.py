@@ -0,0 +1,49 @@
+import asyncio
+import os
+import signal
+
+import bot_railway_full as app
+
+
+class FakeServer:
+    def __init__(self, *args, **kwargs):
+        self.events = []
+
+    async def start(self):
+        self.events.append("start")
+
+    async def stop(self):
+        self.events.append("stop")
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.events = []
+
+    async def emit_startup(self, **kwargs):
+        self.events.append("startup")
+
+    async def emit_shutdown(self, **kwargs):
+        self.events.append("shutdown")
+
+
+def test_sigterm_runs_shutdown(monkeypatch):
+    servers = []
+
+    def make_server(*args, **kwargs):
+        servers.append(FakeServer())
+        return servers[-1]
+
+    dispatcher = FakeDispatcher()
+    monkeypatch.setattr(app, "WebhookServer", make_server)
+    monkeypatch.setattr(app, "dp", dispatcher)
+    monkeypatch.setattr(app, "WEBHOOK_URL", "")
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, os.kill, os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(app.run_webhook(), timeout=5)
+
+    asyncio.run(scenario())
+    assert servers[0].events == ["start", "stop"]
+    assert dispatcher.events == ["startup", "shutdown"]